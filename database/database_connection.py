@@ -1,7 +1,10 @@
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import logging
 import psycopg2
+from psycopg2 import extensions, pool
 
 
 class DatabaseConnection:
@@ -60,3 +63,245 @@ class DatabaseConnection:
         if self.conn:
             self.conn.rollback()
             logging.warning("Transaction rolled back.")
+
+
+class PooledDatabaseConnection(DatabaseConnection):
+    """
+    Thread-safe pool of PostgreSQL connections behind the DatabaseConnection interface.
+
+    New code checks connections out with `with pool.connection() as conn:` or
+    `with pool.cursor() as cursor:`, which commit on success, roll back on
+    errors and return the connection to the pool.
+
+    Existing callers (DataStorage, DatabaseHandler) keep using get_cursor(),
+    commit() and rollback(): every thread transparently gets its own pooled
+    connection, held until release() is called from that thread or the pool is
+    disconnected. Connections are pinged before use and silently replaced when
+    the server dropped them, unless they are in the middle of a transaction.
+    """
+
+    def __init__(self, min_size=1, max_size=10, checkout_timeout=30, pre_ping=True):
+        """
+        Args:
+            min_size (int): Connections opened up front and kept open.
+            max_size (int): Maximum number of connections checked out at once.
+            checkout_timeout (float): Seconds to wait for a free connection
+                before raising PoolError.
+            pre_ping (bool): Check connections with `SELECT 1` before use.
+        """
+        self.db_name = None
+        self.user = None
+        self.password = None
+        self.host = None
+        self.port = None
+        self.load_env_variables()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.pre_ping = pre_ping
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Connections checked out of the current pool
+        self._checked_out = set()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "reconnects": 0,
+            "in_use": 0,
+            "max_in_use": 0,
+        }
+
+    def connect(self):
+        """Opens the pool with its minimum number of connections."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            try:
+                self._pool = pool.ThreadedConnectionPool(
+                    self.min_size,
+                    self.max_size,
+                    dbname=self.db_name,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port,
+                )
+                logging.info(
+                    f"Database connection pool opened ({self.min_size}-{self.max_size} connections)."
+                )
+            except psycopg2.Error as e:
+                logging.error(f"Error connecting to PostgreSQL: {e}")
+                raise
+
+    def disconnect(self):
+        """
+        Closes every connection of the pool, including the checked out ones.
+
+        All slots are free again afterwards; connections still held by other
+        threads are closed and ignored when they are checked in.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                logging.info("Database connection pool closed.")
+            self._checked_out.clear()
+            self._slots = threading.BoundedSemaphore(self.max_size)
+            self._stats["in_use"] = 0
+        self._local = threading.local()
+
+    def _is_alive(self, conn):
+        """Pings an idle connection; busy connections are assumed alive."""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Reconnecting now would silently drop the open transaction
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def checkout(self):
+        """Takes a healthy connection from the pool, waiting for a free one."""
+        if self._pool is None:
+            self.connect()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            if not slots.acquire(timeout=self.checkout_timeout):
+                raise pool.PoolError(
+                    f"No free database connection within {self.checkout_timeout}s."
+                )
+
+        try:
+            conn = self._pool.getconn()
+            if self.pre_ping and not self._is_alive(conn):
+                logging.warning("Replacing a dropped database connection.")
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+                with self._lock:
+                    self._stats["reconnects"] += 1
+        except Exception:
+            slots.release()
+            raise
+
+        with self._lock:
+            current = slots is self._slots
+            if current:
+                self._checked_out.add(conn)
+                self._stats["checkouts"] += 1
+                self._stats["in_use"] += 1
+                self._stats["max_in_use"] = max(
+                    self._stats["max_in_use"], self._stats["in_use"]
+                )
+        if not current:
+            # The pool was closed during this checkout, start over on the new one
+            try:
+                self._pool.putconn(conn)
+            except (AttributeError, pool.PoolError):
+                # No pool, or the connection came from the closed one
+                conn.close()
+            return self.checkout()
+        return conn
+
+    def checkin(self, conn, close=False):
+        """Returns a checked out connection to the pool."""
+        with self._lock:
+            if conn not in self._checked_out:
+                # Checked out before disconnect(), its slot was already freed
+                if not conn.closed:
+                    conn.close()
+                return
+            self._checked_out.discard(conn)
+            self._stats["in_use"] -= 1
+            if self._pool is not None:
+                self._pool.putconn(conn, close=close or bool(conn.closed))
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection; commits on success, rolls back on errors."""
+        conn = self.checkout()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.checkin(conn)
+
+    @contextmanager
+    def cursor(self):
+        """Checks out a connection and yields a cursor on it, see connection()."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @property
+    def conn(self):
+        """The calling thread's connection, checked out on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn not in self._checked_out:
+            conn = self.checkout()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Returns the calling thread's connection to the pool."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            if not conn.closed:
+                conn.rollback()
+            self.checkin(conn)
+
+    def get_cursor(self):
+        """Returns a cursor on the calling thread's connection, reconnecting if it dropped."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self.pre_ping and not self._is_alive(conn):
+            logging.warning("Replacing a dropped database connection.")
+            self._local.conn = None
+            self.checkin(conn, close=True)
+            with self._lock:
+                self._stats["reconnects"] += 1
+        return self.conn.cursor()
+
+    def commit(self):
+        """Commits the calling thread's current transaction."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.commit()
+
+    def rollback(self):
+        """Rolls back the calling thread's current transaction."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not conn.closed:
+            conn.rollback()
+            logging.warning("Transaction rolled back.")
+
+    def stats(self):
+        """
+        Pool utilisation.
+
+        Returns:
+            dict: Connections in use, the peak, checkouts, checkouts that had to
+            wait, replaced dropped connections and the pool limits.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["min_size"] = self.min_size
+        stats["max_size"] = self.max_size
+        stats["utilisation"] = stats["in_use"] / self.max_size
+        return stats
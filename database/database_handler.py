@@ -1,47 +1,235 @@
+import json
 import logging
-import pandas as pd
+import os
+import time
+from itertools import islice
+
+from psycopg2.extras import execute_values
+
+# Columns of the detected_objects table, in insert order
+DETECTION_COLUMNS = (
+    "image_name",
+    "class_name",
+    "confidence",
+    "x_min",
+    "y_min",
+    "x_max",
+    "y_max",
+    "detection_time",
+    "save_path",
+    "model_name",
+)
+
+CREATE_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS detected_objects (
+    id SERIAL PRIMARY KEY,
+    image_name VARCHAR NOT NULL,
+    class_name VARCHAR,
+    confidence REAL,
+    x_min REAL,
+    y_min REAL,
+    x_max REAL,
+    y_max REAL,
+    detection_time TIMESTAMP,
+    save_path VARCHAR,
+    model_name VARCHAR  -- Rows of different models are kept apart
+);
+ALTER TABLE detected_objects ADD COLUMN IF NOT EXISTS model_name VARCHAR;
+CREATE INDEX IF NOT EXISTS detected_objects_image_model
+    ON detected_objects (image_name, model_name);
+"""
 
 
 class DatabaseHandler:
     """Class to handle database operations such as storing detection data."""
 
-    def __init__(self, db_conn):
-        """Initializes the DatabaseHandler with an active database connection."""
+    def __init__(
+        self,
+        db_conn,
+        batch_size=1000,
+        max_retries=3,
+        retry_delay=1.0,
+        dead_letter_path="../data/failed_detections.jsonl",
+    ):
+        """
+        Initializes the DatabaseHandler with an active database connection.
+
+        Args:
+            db_conn (DatabaseConnection): The database connection to write with.
+            batch_size (int): Detections per insert and commit.
+            max_retries (int): Retries of a failed batch before it is dead-lettered.
+            retry_delay (float): Seconds before the first retry, doubled per retry.
+            dead_letter_path (str): JSON lines file receiving batches that still
+                fail after all retries.
+        """
         self.db_conn = db_conn  # Use an existing DatabaseConnection object
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.dead_letter_path = dead_letter_path
+        self._table_ready = False
 
-    def store_detections(self, detections):
-        """Stores detection data into the PostgreSQL database using the provided connection."""
+    def create_table(self):
+        """Creates the detected_objects table, or adds the model_name column to it."""
+        cursor = self.db_conn.get_cursor()
         try:
-            # Get a cursor from the existing DatabaseConnection
-            cursor = self.db_conn.get_cursor()
-
-            # Convert detections list to pandas DataFrame
-            df = pd.DataFrame(detections)
-
-            # Use COPY FROM to insert data efficiently if needed, or just simple inserts
-            for _, row in df.iterrows():
-                cursor.execute(
-                    """
-                    INSERT INTO detected_objects (image_name, class_name, confidence, x_min, y_min, x_max, y_max, detection_time, save_path )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
-                    """,
-                    (
-                        row["image_name"],
-                        row["class_name"],
-                        row["confidence"],
-                        row["x_min"],
-                        row["y_min"],
-                        row["x_max"],
-                        row["y_max"],
-                        row["detection_time"],
-                        row["save_path"],
-                    ),
-                )
+            cursor.execute(CREATE_TABLE_QUERY)
+            self.db_conn.commit()
+            self._table_ready = True
+        finally:
+            cursor.close()
 
-            # Commit the transaction
+    def _insert(self, cursor, detections):
+        execute_values(
+            cursor,
+            f"INSERT INTO detected_objects ({', '.join(DETECTION_COLUMNS)}) VALUES %s",
+            [
+                tuple(detection[column] for column in DETECTION_COLUMNS)
+                for detection in detections
+            ],
+            page_size=self.batch_size,
+        )
+
+    def _insert_batch(self, batch):
+        """Inserts one batch of detections with a single statement and commits it."""
+        cursor = self.db_conn.get_cursor()
+        try:
+            self._insert(cursor, batch)
+            self.db_conn.commit()
+        finally:
+            cursor.close()
+
+    def _replace_images(self, image_names, model_name, detections):
+        """Deletes the model's rows of the images and inserts the new ones, in one transaction."""
+        cursor = self.db_conn.get_cursor()
+        try:
+            cursor.execute(
+                "DELETE FROM detected_objects "
+                "WHERE model_name = %s AND image_name = ANY(%s)",
+                (model_name, list(image_names)),
+            )
+            if detections:
+                self._insert(cursor, detections)
             self.db_conn.commit()
-            logging.info(f"Stored {len(df)} detection records to the database.")
+        finally:
+            cursor.close()
+
+    def _write_with_retries(self, write, batch):
+        """
+        Runs `write()`, rolling back and retrying with exponential backoff on
+        errors, and dead-letters the batch if it keeps failing.
+
+        Returns:
+            bool: True if the batch was written.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                if not self._table_ready:
+                    self.create_table()
+                write()
+                return True
+            except Exception as e:
+                try:
+                    self.db_conn.rollback()  # Rollback if something goes wrong
+                except Exception as rollback_error:
+                    logging.warning(f"Rollback failed: {rollback_error}")
+                if attempt == self.max_retries:
+                    self._dead_letter(batch, e)
+                    return False
+                logging.warning(f"Error storing {len(batch)} detections, retrying: {e}")
+                time.sleep(self.retry_delay * 2**attempt)
+
+    def _dead_letter(self, batch, error):
+        """Appends a batch that couldn't be stored to the dead-letter file."""
+        folder = os.path.dirname(self.dead_letter_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for detection in batch:
+                f.write(
+                    json.dumps(
+                        {"detection": detection, "error": str(error)}, default=str
+                    )
+                    + "\n"
+                )
+        logging.error(
+            f"Wrote {len(batch)} detections that couldn't be stored to "
+            f"{self.dead_letter_path}: {error}"
+        )
+
+    def store_detections(self, detections):
+        """
+        Stores detection data into the PostgreSQL database using the provided connection.
+
+        Detections are consumed lazily and written in batches of `batch_size`,
+        each in its own transaction, so a generator can be passed and memory
+        stays flat. A failing batch is rolled back and retried with exponential
+        backoff; if it keeps failing it goes to the dead-letter file and the
+        remaining batches are still stored.
+
+        Args:
+            detections (iterable): Detection dicts with the DETECTION_COLUMNS keys.
+
+        Returns:
+            dict: Number of stored and dead-lettered detections.
+        """
+        stats = {"stored": 0, "failed": 0}
+        start = time.perf_counter()
+        detections = iter(detections)
+        while True:
+            batch = list(islice(detections, self.batch_size))
+            if not batch:
+                break
+
+            if self._write_with_retries(lambda: self._insert_batch(batch), batch):
+                stats["stored"] += len(batch)
+            else:
+                stats["failed"] += len(batch)
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"Stored {stats['stored']} detection records to the database in "
+            f"{elapsed:.1f}s ({stats['failed']} failed)."
+        )
+        return stats
+
+    def replace_detections(self, image_names, model_name, detections):
+        """
+        Stores the detections of re-processed images, replacing earlier ones.
+
+        The model's existing rows of the images are deleted and the new
+        detections inserted in a single transaction, so re-processing an image
+        never leaves duplicate or stale rows, also for images that no longer
+        have any detection. The detections are held in memory to retry a
+        failing transaction, so pass a bounded number of images, e.g. one
+        ImageRegistry chunk. If it keeps failing, its detections are
+        dead-lettered and all images are counted in `failed_images`.
+
+        Args:
+            image_names (list): Names of the processed images.
+            model_name (str): The model the detections come from.
+            detections (iterable): Detection dicts of these images.
 
-        except Exception as e:
-            logging.error(f"Error storing detection data to the database: {e}")
-            self.db_conn.rollback()  # Rollback if something goes wrong
+        Returns:
+            dict: Number of stored and dead-lettered detections, and of images
+            whose detections weren't replaced.
+        """
+        detections = list(detections)
+        start = time.perf_counter()
+        if self._write_with_retries(
+            lambda: self._replace_images(image_names, model_name, detections),
+            detections,
+        ):
+            stats = {"stored": len(detections), "failed": 0, "failed_images": 0}
+        else:
+            stats = {
+                "stored": 0,
+                "failed": len(detections),
+                "failed_images": len(image_names),
+            }
+        logging.info(
+            f"Replaced the detections of {len(image_names)} images with "
+            f"{stats['stored']} records in {time.perf_counter() - start:.1f}s "
+            f"({stats['failed']} failed)."
+        )
+        return stats
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from crawl_scheduler import update_json_file
+
+
+class HostRateLimiter:
+    """Thread-safe rate limiter that spaces out requests to each host evenly."""
+
+    def __init__(self, requests_per_second=5.0):
+        """
+        Args:
+            requests_per_second (float): Maximum request rate per host.
+                A value of 0 or None disables the limiter.
+        """
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """Block until a request to the host of `url` may be issued."""
+        if not self.interval:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now, slot = self._reserve(host)
+
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def _reserve(self, host):
+        """Reserves the host's next request slot; returns (now, slot)."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        return now, slot
+
+
+class SharedHostRateLimiter(HostRateLimiter):
+    """
+    HostRateLimiter whose request slots are shared by crawler processes.
+
+    The next free slot per host is kept in a locked JSON file, so processes
+    crawling the same host together stay within one `requests_per_second`.
+    """
+
+    def __init__(self, path="../../data/crawl_rate.json", requests_per_second=5.0):
+        """
+        Args:
+            path (str): Slot file shared with the other crawler processes.
+            requests_per_second (float): Maximum request rate per host across
+                all processes.
+        """
+        super().__init__(requests_per_second)
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def _reserve(self, host):
+        # Wall-clock time, monotonic clocks aren't comparable between processes
+        def change(slots):
+            now = time.time()
+            slot = max(now, slots.get(host, now))
+            slots[host] = slot + self.interval
+            return now, slot
+
+        return update_json_file(self.path, change)
+
+
+async def crawl_in_order(
+    fetch, post_ids, handle_result, concurrency=8, reorder_window=None
+):
+    """
+    Fetches posts concurrently and hands the results off in post_id order.
+
+    Args:
+        fetch (callable): Blocking function taking a post_id and returning a result.
+        post_ids (iterable): Post ids to fetch, in the order results should be handed off.
+        handle_result (callable): Called as handle_result(post_id, result) in order.
+        concurrency (int): Maximum number of fetches in flight.
+        reorder_window (int): Maximum number of finished results held back while
+            waiting for a slower, earlier post (default is 4 * concurrency).
+
+    Returns:
+        int: The number of posts processed.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    window = reorder_window or concurrency * 4
+    pending = deque()
+    processed = 0
+
+    async def run(executor, post_id):
+        try:
+            return await loop.run_in_executor(executor, fetch, post_id)
+        except Exception as e:
+            print(f"Failed to fetch post {post_id}: {e}")
+            return None
+        finally:
+            semaphore.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for post_id in post_ids:
+            await semaphore.acquire()
+            pending.append((post_id, asyncio.create_task(run(executor, post_id))))
+
+            # Hand off every finished result at the head of the queue, and block
+            # on the head once too many later results are waiting behind it
+            while pending and (pending[0][1].done() or len(pending) >= window):
+                head_id, task = pending.popleft()
+                handle_result(head_id, await task)
+                processed += 1
+
+        while pending:
+            head_id, task = pending.popleft()
+            handle_result(head_id, await task)
+            processed += 1
+
+    return processed
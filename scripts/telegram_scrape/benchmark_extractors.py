@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import re
+import time
+
+from html_archive import HtmlArchive, read_segment
+from http_transport import HttpTransport
+from post_extractors import EXTRACTORS, get_extractor
+
+
+def save_fixtures(channel, pages, folder):
+    """Fetches `pages` feed pages of a channel and saves them as HTML fixtures."""
+    os.makedirs(folder, exist_ok=True)
+    transport = HttpTransport()
+    extractor = get_extractor("html.parser")
+    before = None
+    saved = 0
+
+    for page in range(pages):
+        url = f"https://t.me/s/{channel}" + (f"?before={before}" if before else "")
+        response = transport.get(url)
+        if response is None:
+            break
+
+        with open(
+            os.path.join(folder, f"{channel}_{page:04d}.html"), "w", encoding="utf-8"
+        ) as f:
+            f.write(response.text)
+        saved += 1
+
+        # Continue with the page of posts older than the oldest one on this page
+        _, posts = extractor.parse_page(response.text)
+        post_numbers = [
+            int(re.search(r"/(\d+)$", post["data_post"]).group(1)) for post in posts
+        ]
+        if not post_numbers or min(post_numbers) <= 1:
+            break
+        before = min(post_numbers)
+
+    print(f"Saved {saved} fixture pages for {channel} to {folder}")
+
+
+def load_archive_pages(root, limit):
+    """Loads up to `limit` pages from the raw HTML archive as (name, html) pairs."""
+    pages = []
+    for paths in HtmlArchive(root).segments().values():
+        for path in paths:
+            for page in read_segment(path):
+                pages.append((f"{page['url']} ({page['fetched_at']})", page["html"]))
+                if len(pages) >= limit:
+                    return pages
+    return pages
+
+
+def run_benchmark(folder, repeat, archive=None, limit=200):
+    """Times every extraction backend on the fixtures and checks their output matches."""
+    if archive:
+        named_pages = load_archive_pages(archive, limit)
+    else:
+        named_pages = []
+        for path in sorted(glob.glob(os.path.join(folder, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                named_pages.append((path, f.read()))
+    if not named_pages:
+        print("No HTML fixtures found, run with --fetch or --archive first.")
+        return
+
+    paths = [name for name, _ in named_pages]
+    pages = [html for _, html in named_pages]
+    print(f"{len(pages)} fixture pages, {repeat} repetitions")
+
+    outputs = {}
+    for name in EXTRACTORS:
+        extractor = get_extractor(name)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = [extractor.parse_page(page) for page in pages]
+        elapsed = time.perf_counter() - start
+
+        outputs[name] = results
+        post_count = sum(len(posts) for _, posts in results)
+        print(
+            f"{name:>12}: {elapsed / (repeat * len(pages)) * 1000:8.2f} ms/page, "
+            f"{post_count * repeat / elapsed:10.0f} posts/s"
+        )
+
+    # Every backend must produce exactly the same records
+    reference_name, reference = next(iter(outputs.items()))
+    for name, results in list(outputs.items())[1:]:
+        mismatches = [
+            path for path, a, b in zip(paths, reference, results) if a != b
+        ]
+        if mismatches:
+            print(f"{name} differs from {reference_name} on: {mismatches}")
+        else:
+            print(f"{name} output matches {reference_name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the HTML extraction backends on saved t.me/s pages."
+    )
+    parser.add_argument("--fixtures", default="../../data/html_fixtures")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fetch", metavar="CHANNEL", help="Save fixtures first")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--archive", help="Use pages from the raw HTML archive")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.fetch:
+        save_fixtures(args.fetch, args.pages, args.fixtures)
+    run_benchmark(args.fixtures, args.repeat, args.archive, args.limit)
@@ -0,0 +1,483 @@
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# One unit of crawl work: a blocking callable and the number of requests it issues
+CrawlStep = namedtuple("CrawlStep", ["fetch", "requests"])
+
+
+def load_channel_config(path):
+    """
+    Loads the channels to crawl from a config file.
+
+    Either a JSON file of the form
+    {"channels": {"<username>": {"record_extractors": [...], "max_requests": 500}},
+     "global_max_requests": 10000}
+    or a plain text file with one channel username per line.
+
+    Returns:
+        dict: {"channels": {username: options}, "global_max_requests": int or None}
+    """
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+
+    if path.endswith(".json"):
+        config = json.loads(content)
+        channels = config.get("channels", {})
+        if isinstance(channels, list):
+            channels = {channel: {} for channel in channels}
+        return {
+            "channels": channels,
+            "global_max_requests": config.get("global_max_requests"),
+        }
+
+    channels = {
+        line.strip(): {}
+        for line in content.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    }
+    return {"channels": channels, "global_max_requests": None}
+
+
+def update_json_file(path, change):
+    """
+    Applies `change(content)` to a JSON object file under an exclusive lock.
+
+    The file is shared by crawler processes, so every read-modify-write happens
+    while holding an flock on it.
+
+    Returns:
+        The return value of `change`.
+    """
+    with open(path, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            data = json.loads(content) if content else {}
+            result = change(data)
+            f.seek(0)
+            f.truncate()
+            json.dump(data, f)
+            f.flush()
+            return result
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RequestBudget:
+    """
+    Request budget of a crawl run, charged by the HTTP transport for every attempt.
+
+    Page fetches, retries and image downloads all count. With a `path`, the
+    count lives in a locked file so that crawler processes started together
+    spend one budget between them; the starting process calls reset() first.
+    """
+
+    def __init__(self, max_requests=None, path=None):
+        """
+        Args:
+            max_requests (int): Maximum number of requests, None for no limit.
+            path (str): Optional counter file shared with other crawler processes.
+        """
+        self.max_requests = max_requests
+        self.path = path
+        self._spent = 0
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def reset(self):
+        """Starts a new run with nothing spent."""
+        with self._lock:
+            self._spent = 0
+            if self.path:
+                update_json_file(self.path, lambda data: data.update(spent=0))
+
+    def try_spend(self, requests=1):
+        """Charges `requests` to the budget; returns False if they don't fit."""
+
+        def change(data):
+            spent = data.get("spent", 0)
+            if self.max_requests is not None and spent + requests > self.max_requests:
+                return False
+            data["spent"] = spent + requests
+            return True
+
+        with self._lock:
+            if self.path:
+                return update_json_file(self.path, change)
+            data = {"spent": self._spent}
+            spent = change(data)
+            self._spent = data["spent"]
+            return spent
+
+    @property
+    def spent(self):
+        """Requests charged so far, by every process sharing the budget."""
+        with self._lock:
+            if self.path:
+                return update_json_file(self.path, lambda data: data.get("spent", 0))
+            return self._spent
+
+    def remaining(self):
+        """Requests left, None without a limit."""
+        if self.max_requests is None:
+            return None
+        return max(self.max_requests - self.spent, 0)
+
+
+class LeaseFile:
+    """
+    Channel leases shared by crawler processes through a single locked JSON file.
+
+    A process only crawls a channel while it holds the channel's lease, so several
+    crawlers started on one box split the channel list between them. Leases
+    expire after `ttl` seconds unless renewed, so a crashed crawler's channels
+    are picked up again.
+    """
+
+    def __init__(self, path="../../data/crawl_leases.json", ttl=600, owner=None):
+        """
+        Args:
+            path (str): Path of the lease file.
+            ttl (float): Seconds a lease stays valid without being renewed.
+            owner (str): Name the leases are held under, defaults to host:pid.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def _update(self, change):
+        """Applies `change(leases)` to the lease file under an exclusive lock."""
+        return update_json_file(self.path, change)
+
+    def acquire(self, channel, since=0):
+        """
+        Takes or renews the lease on a channel.
+
+        Returns False if another process holds it, or if some process finished
+        crawling it after `since`, e.g. the start of the current run.
+        """
+
+        def change(leases):
+            lease = leases.get(channel)
+            now = time.time()
+            if lease and lease.get("finished_at", 0) > since:
+                return False
+            if lease and lease["owner"] != self.owner and lease["expires"] > now:
+                return False
+            leases[channel] = {"owner": self.owner, "expires": now + self.ttl}
+            return True
+
+        return self._update(change)
+
+    def release(self, channel, finished=False):
+        """
+        Gives up the lease on a channel.
+
+        Args:
+            finished (bool): The channel was crawled to completion, recorded so
+                processes waiting for the lease don't crawl it again.
+        """
+
+        def change(leases):
+            if leases.get(channel, {}).get("owner") == self.owner:
+                if finished:
+                    leases[channel] = {
+                        "owner": None,
+                        "expires": 0,
+                        "finished_at": time.time(),
+                    }
+                else:
+                    del leases[channel]
+
+        self._update(change)
+
+    def finished_since(self, channel, since):
+        """Returns True if some process finished crawling the channel after `since`."""
+        return self._update(
+            lambda leases: leases.get(channel, {}).get("finished_at", 0) > since
+        )
+
+
+class ChannelProgress:
+    """
+    Crawl progress of a single channel.
+
+    `budget` is the channel's RequestBudget. It is handed to the channel's job
+    so that the transport charges it for every request of the channel,
+    including retries and image downloads.
+    """
+
+    def __init__(self, channel, max_requests=None):
+        self.channel = channel
+        self.max_requests = max_requests
+        self.budget = RequestBudget(max_requests)
+        self.steps = 0
+        self.status = "pending"
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def requests(self):
+        """Requests the transport issued for the channel."""
+        return self.budget.spent
+
+    def __str__(self):
+        elapsed = (self.finished_at or time.time()) - (self.started_at or time.time())
+        budget = f"/{self.max_requests}" if self.max_requests else ""
+        return (
+            f"{self.channel}: {self.status}, {self.requests}{budget} requests, "
+            f"{elapsed:.0f}s"
+        )
+
+
+class CrawlScheduler:
+    """
+    Interleaves the crawls of many channels over a shared pool of request threads.
+
+    Every channel is a job: a generator that yields CrawlStep objects and receives
+    each step's result back through send(). Channels take turns round-robin, with
+    at most one step per channel in flight, so one huge channel can't block the
+    small ones. Results are handled on the scheduler's thread, so jobs may write
+    to the state store and sinks without locking.
+
+    A channel is only leased when it is about to be crawled, and at most
+    `max_leases` channels are crawled at a time, so crawler processes sharing a
+    lease file split the channels between them. Channels leased by another
+    process are retried every `lease_retry_interval` seconds until this process
+    gets the lease or the other one finishes them.
+    """
+
+    def __init__(
+        self,
+        concurrency=4,
+        request_budget=None,
+        lease_file=None,
+        report_interval=30,
+        lease_retry_interval=30,
+        max_leases=None,
+    ):
+        """
+        Args:
+            concurrency (int): Maximum number of steps in flight across all channels.
+            request_budget (RequestBudget): Request budget for the whole run, charged
+                by the transport; no step is started once it can't fit.
+            lease_file (LeaseFile): Optional lease file shared with other crawler
+                processes; channels leased by another process wait for the lease.
+            report_interval (float): Seconds between progress reports.
+            lease_retry_interval (float): Seconds between attempts to lease the
+                channels held by other processes.
+            max_leases (int): Maximum number of channels crawled at a time,
+                defaults to `concurrency`.
+        """
+        self.concurrency = concurrency
+        self.request_budget = request_budget
+        self.lease_file = lease_file
+        self.report_interval = report_interval
+        self.lease_retry_interval = lease_retry_interval
+        self.max_leases = max_leases or concurrency
+        self.requests = 0
+        self.progress = {}
+        self._jobs = {}
+        self._lease_renewed_at = {}
+        # Channels started and not finished yet
+        self._active = set()
+        self._run_started = None
+
+    def add(self, channel, job_factory, max_requests=None):
+        """
+        Registers a channel.
+
+        Args:
+            channel (str): The channel username.
+            job_factory (callable): Called with the channel's RequestBudget,
+                returns the channel's job generator; only called once the
+                channel's lease is held. The job's requests must be charged to
+                the budget, e.g. by passing it to the transport.
+            max_requests (int): Request budget for this channel.
+        """
+        self._jobs[channel] = job_factory
+        self.progress[channel] = ChannelProgress(channel, max_requests)
+
+    def report(self):
+        """Prints the progress of every channel."""
+        if self.request_budget and self.request_budget.max_requests is not None:
+            print(
+                f"crawl progress: {self.requests} requests scheduled, "
+                f"{self.request_budget.spent}/{self.request_budget.max_requests} "
+                "requests of the global budget spent"
+            )
+        else:
+            print(f"crawl progress: {self.requests} requests scheduled")
+        for progress in self.progress.values():
+            print(f"  {progress}")
+
+    def _start(self, channel):
+        """Leases and primes a channel's job; returns (job, first step) or None."""
+        progress = self.progress[channel]
+        if self.lease_file:
+            if not self.lease_file.acquire(channel, self._run_started):
+                if self.lease_file.finished_since(channel, self._run_started):
+                    progress.status = "done elsewhere"
+                    progress.started_at = progress.finished_at = time.time()
+                else:
+                    progress.status = "leased elsewhere"
+                return None
+            self._lease_renewed_at[channel] = time.time()
+
+        progress.status = "running"
+        progress.started_at = time.time()
+        self._active.add(channel)
+        job = self._jobs[channel](progress.budget)
+        try:
+            return job, next(job)
+        except StopIteration:
+            self._finish(channel, "done")
+            return None
+
+    def _finish(self, channel, status, job=None):
+        if job is not None:
+            job.close()
+        progress = self.progress[channel]
+        progress.status = status
+        progress.finished_at = time.time()
+        self._active.discard(channel)
+        if self.lease_file:
+            self.lease_file.release(channel, finished=status == "done")
+
+    def _renew_lease(self, channel):
+        """Renews the channel's lease once a third of its TTL has passed."""
+        if not self.lease_file:
+            return True
+        if time.time() - self._lease_renewed_at[channel] < self.lease_file.ttl / 3:
+            return True
+        self._lease_renewed_at[channel] = time.time()
+        return self.lease_file.acquire(channel)
+
+    def _budget_spent(self, requests):
+        """Returns True if `requests` more requests don't fit the global budget."""
+        if self.request_budget is None:
+            return False
+        remaining = self.request_budget.remaining()
+        return remaining is not None and remaining < requests
+
+    def _lease_more(self, pending, waiting, ready):
+        """Starts pending channels until `max_leases` channels are being crawled."""
+        while pending and len(self._active) < self.max_leases:
+            if self._budget_spent(1):
+                return
+            channel = pending.popleft()
+            started = self._start(channel)
+            if started:
+                ready.append((channel, *started))
+            elif self.progress[channel].status == "leased elsewhere":
+                waiting.append(channel)
+
+    def _start_waiting(self, waiting, ready):
+        """Tries again to lease the channels other processes held."""
+        for channel in list(waiting):
+            if len(self._active) >= self.max_leases:
+                break
+            started = self._start(channel)
+            if self.progress[channel].status != "leased elsewhere":
+                waiting.remove(channel)
+            if started:
+                ready.append((channel, *started))
+
+    def run(self):
+        """Runs every channel's job to completion or until its budget is spent."""
+        self._run_started = time.time()
+        pending = deque(self._jobs)
+        ready = deque()
+        waiting = []
+        self._active = set()
+
+        in_flight = {}
+        last_report = time.time()
+        last_lease_retry = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                # Lease the next channels as soon as others are finished
+                self._lease_more(pending, waiting, ready)
+
+                # Hand out steps round-robin while there is spare concurrency
+                while ready and len(in_flight) < self.concurrency:
+                    channel, job, step = ready.popleft()
+                    budget = self.progress[channel].budget
+                    if self._budget_spent(step.requests):
+                        self._finish(channel, "global budget spent", job)
+                        continue
+                    remaining = budget.remaining()
+                    if remaining is not None and remaining < step.requests:
+                        self._finish(channel, "budget spent", job)
+                        continue
+
+                    self.requests += step.requests
+                    self.progress[channel].steps += 1
+                    in_flight[executor.submit(step.fetch)] = (channel, job)
+
+                if not in_flight:
+                    if pending and not self._budget_spent(1):
+                        # Channels finished while handing out steps
+                        continue
+                    if not waiting or self._budget_spent(1):
+                        break
+                    # Only channels leased elsewhere are left, wait for their leases
+                    time.sleep(
+                        max(
+                            0.0,
+                            last_lease_retry + self.lease_retry_interval - time.time(),
+                        )
+                    )
+
+                done, _ = wait(
+                    in_flight,
+                    timeout=self.lease_retry_interval if waiting else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    channel, job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"{channel}: crawl step failed: {e}")
+                        result = None
+
+                    try:
+                        step = job.send(result)
+                    except StopIteration:
+                        self._finish(channel, "done")
+                        continue
+                    except Exception as e:
+                        print(f"{channel}: crawl job failed: {e}")
+                        self._finish(channel, "failed")
+                        continue
+
+                    if not self._renew_lease(channel):
+                        self._finish(channel, "lease lost", job)
+                        continue
+                    ready.append((channel, job, step))
+
+                if (
+                    waiting
+                    and time.time() - last_lease_retry >= self.lease_retry_interval
+                ):
+                    self._start_waiting(waiting, ready)
+                    last_lease_retry = time.time()
+
+                if time.time() - last_report >= self.report_interval:
+                    self.report()
+                    last_report = time.time()
+
+        self.report()
+        return self.progress
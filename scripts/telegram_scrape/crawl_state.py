@@ -0,0 +1,187 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+
+class CrawlStateStore:
+    """
+    SQLite-backed crawl watermarks for incremental scraping.
+
+    For every channel the store keeps the watermark (the highest post number up to
+    which every post was either scraped or recorded as a gap), the gaps that still
+    need to be fetched, and the time of the last run.
+    """
+
+    def __init__(
+        self, db_path="../../data/crawl_state.db", commit_every=100, before_commit=None
+    ):
+        """
+        Args:
+            db_path (str): Path of the SQLite state file.
+            commit_every (int): Number of updates to batch into one commit.
+            before_commit (callable): Called before every commit, e.g. to flush
+                buffered output so the state never runs ahead of the data.
+        """
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Several crawler processes may share the file, so wait for their writes
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.commit_every = commit_every
+        self.before_commit = before_commit
+        self._pending_updates = 0
+        self.create_tables()
+
+    def create_tables(self):
+        """Creates the state tables if they don't exist."""
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS channel_state (
+                channel TEXT PRIMARY KEY,
+                watermark INTEGER NOT NULL DEFAULT 0,
+                last_run TEXT
+            );
+            CREATE TABLE IF NOT EXISTS crawl_gaps (
+                channel TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                PRIMARY KEY (channel, post_id)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.conn.commit()
+
+    def _updated(self):
+        self._pending_updates += 1
+        if self._pending_updates >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """Writes all batched updates to disk."""
+        if self.before_commit:
+            self.before_commit()
+        self.conn.commit()
+        self._pending_updates = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def has_channel(self, channel):
+        """Return True if the store already tracks the channel."""
+        row = self.conn.execute(
+            "SELECT 1 FROM channel_state WHERE channel = ?", (channel,)
+        ).fetchone()
+        return row is not None
+
+    def get_watermark(self, channel):
+        """Return the highest contiguous post number processed for the channel."""
+        row = self.conn.execute(
+            "SELECT watermark FROM channel_state WHERE channel = ?", (channel,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_gaps(self, channel):
+        """Return the post numbers below the watermark that still need fetching."""
+        rows = self.conn.execute(
+            "SELECT post_id FROM crawl_gaps WHERE channel = ? ORDER BY post_id",
+            (channel,),
+        )
+        return [row[0] for row in rows]
+
+    def pending_post_ids(self, channel, stop):
+        """
+        Returns the post numbers an incremental run has to fetch.
+
+        Args:
+            channel (str): The channel username.
+            stop (int): Upper bound (exclusive) of the post numbers to fetch.
+
+        Returns:
+            list: Known gaps followed by every post number above the watermark.
+        """
+        watermark = self.get_watermark(channel)
+        return self.get_gaps(channel) + list(range(watermark + 1, stop))
+
+    def _advance(self, channel, post_id, fill_gaps):
+        watermark = self.get_watermark(channel)
+        if post_id <= watermark:
+            return
+
+        if fill_gaps:
+            # Posts skipped on the way up still have to be fetched later
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO crawl_gaps (channel, post_id) VALUES (?, ?)",
+                ((channel, gap) for gap in range(watermark + 1, post_id)),
+            )
+        self.conn.execute(
+            """
+            INSERT INTO channel_state (channel, watermark) VALUES (?, ?)
+            ON CONFLICT (channel) DO UPDATE SET watermark = excluded.watermark
+            """,
+            (channel, post_id),
+        )
+
+    def mark_scraped(self, channel, post_id, fill_gaps=True):
+        """
+        Records that a post was scraped.
+
+        Args:
+            channel (str): The channel username.
+            post_id (int): The post number that was scraped.
+            fill_gaps (bool): Record post numbers skipped between the watermark and
+                `post_id` as gaps. Feed walks pass False because the feed only
+                skips posts that don't exist.
+        """
+        self.conn.execute(
+            "DELETE FROM crawl_gaps WHERE channel = ? AND post_id = ?",
+            (channel, post_id),
+        )
+        self._advance(channel, post_id, fill_gaps)
+        self._updated()
+
+    def mark_gap(self, channel, post_id):
+        """Records that a post could not be scraped and should be retried."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO crawl_gaps (channel, post_id) VALUES (?, ?)",
+            (channel, post_id),
+        )
+        self._advance(channel, post_id, fill_gaps=True)
+        self._updated()
+
+    def record_run(self, channel):
+        """Stores the time of the latest run for the channel."""
+        self.conn.execute(
+            """
+            INSERT INTO channel_state (channel, last_run) VALUES (?, ?)
+            ON CONFLICT (channel) DO UPDATE SET last_run = excluded.last_run
+            """,
+            (channel, datetime.now(timezone.utc).isoformat()),
+        )
+        self.commit()
+
+    def bootstrap(self, channel, scraped_numbers):
+        """
+        Seeds the state of a channel from post numbers scraped before the store existed.
+
+        The watermark is set to the highest scraped post and every missing post
+        number below it is recorded as a gap.
+        """
+        scraped_numbers = set(scraped_numbers)
+        watermark = max(scraped_numbers, default=0)
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO crawl_gaps (channel, post_id) VALUES (?, ?)",
+            (
+                (channel, post_id)
+                for post_id in range(1, watermark)
+                if post_id not in scraped_numbers
+            ),
+        )
+        self.conn.execute(
+            """
+            INSERT INTO channel_state (channel, watermark) VALUES (?, ?)
+            ON CONFLICT (channel) DO UPDATE SET watermark = excluded.watermark
+            """,
+            (channel, watermark),
+        )
+        self.commit()
@@ -0,0 +1,86 @@
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class HtmlArchive:
+    """
+    Compressed, append-only archive of fetched t.me/s pages.
+
+    Pages are stored as JSON lines in gzip segments laid out as
+    `<root>/<channel>/<first>-<last>.jsonl.gz`, where every segment covers
+    `range_size` post numbers. Each append adds a new gzip member, so segments
+    are never rewritten and a crash can at most lose the page being written.
+    """
+
+    def __init__(self, root="../../data/html_archive", range_size=1000):
+        """
+        Args:
+            root (str): Root folder of the archive.
+            range_size (int): Number of post numbers covered by one segment.
+        """
+        self.root = root
+        self.range_size = range_size
+        self._lock = threading.Lock()
+
+    def segment_path(self, channel, post_id):
+        """Return the segment file holding pages keyed by `post_id`."""
+        first = post_id // self.range_size * self.range_size
+        last = first + self.range_size - 1
+        return os.path.join(self.root, channel, f"{first:08d}-{last:08d}.jsonl.gz")
+
+    def append(self, channel, post_id, url, html, kind="post"):
+        """
+        Stores a fetched page.
+
+        Args:
+            channel (str): The channel username.
+            post_id (int): The post number the page is keyed by (the requested
+                post for post pages, the oldest post on the page for feed pages).
+            url (str): The URL the page was fetched from.
+            html (str): The page content.
+            kind (str): "post" for single post pages, "feed" for feed pages.
+        """
+        path = self.segment_path(channel, post_id)
+        line = json.dumps(
+            {
+                "channel": channel,
+                "post_id": post_id,
+                "kind": kind,
+                "url": url,
+                "fetched_at": time.time(),
+                "html": html,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def segments(self, channels=None):
+        """
+        Lists the archive segments, grouped by channel.
+
+        Args:
+            channels (iterable): Only list segments of these channels.
+
+        Returns:
+            dict: Channel username mapped to its sorted segment paths.
+        """
+        grouped = {}
+        for path in sorted(glob.glob(os.path.join(self.root, "*", "*.jsonl.gz"))):
+            channel = os.path.basename(os.path.dirname(path))
+            if channels is None or channel in channels:
+                grouped.setdefault(channel, []).append(path)
+        return grouped
+
+
+def read_segment(path):
+    """Yields every archived page stored in a segment file."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,240 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker that stops requests to a host after repeated failures."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures before the circuit opens.
+            reset_timeout (float): Seconds to wait before letting a trial request through.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        """Return True if a request to the host may be issued."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at >= self.reset_timeout:
+                # Half-open: let one trial request through and re-arm the timer
+                self._opened_at[host] = time.monotonic()
+                return True
+            return False
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= self.failure_threshold:
+                if host not in self._opened_at:
+                    print(f"Circuit opened for {host} after {self._failures[host]} failures.")
+                self._opened_at[host] = time.monotonic()
+
+
+class HttpTransport:
+    """Pooled keep-alive HTTP transport with retries, backoff and a circuit breaker."""
+
+    def __init__(
+        self,
+        pool_size=10,
+        retries=3,
+        backoff_base=1.0,
+        backoff_max=60.0,
+        timeout=30,
+        failure_threshold=5,
+        reset_timeout=60,
+        rate_limiter=None,
+        request_budget=None,
+        max_in_flight=None,
+    ):
+        """
+        Args:
+            pool_size (int): Number of keep-alive connections kept per host.
+            retries (int): Number of attempts before giving up on a URL.
+            backoff_base (float): Initial backoff delay in seconds, doubled per attempt.
+            backoff_max (float): Upper bound for a single backoff or Retry-After delay.
+            timeout (float): Connect/read timeout in seconds for each request.
+            failure_threshold (int): Consecutive failures before a host's circuit opens.
+            reset_timeout (float): Seconds before an open circuit lets a trial request through.
+            rate_limiter (HostRateLimiter): Optional per-host rate limiter.
+            request_budget (RequestBudget): Optional budget charged for every
+                attempt; requests beyond it are not issued.
+            max_in_flight (int): Maximum number of requests issued at once across
+                all threads using the transport, None for no limit. A streamed
+                response holds its slot until it is closed.
+        """
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.request_budget = request_budget
+        self._in_flight = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.circuit_breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "bytes": 0,
+            "over_budget": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _acquire_slot(self):
+        if self._in_flight:
+            self._in_flight.acquire()
+
+    def _release_slot(self):
+        if self._in_flight:
+            self._in_flight.release()
+
+    def _release_on_close(self, response):
+        """Keeps the request's in-flight slot until the streamed response is closed."""
+        close = response.close
+        lock = threading.Lock()
+        released = False
+
+        def close_and_release():
+            nonlocal released
+            try:
+                close()
+            finally:
+                with lock:
+                    if not released:
+                        released = True
+                        self._release_slot()
+
+        response.close = close_and_release
+
+    def add_bytes(self, amount):
+        """Record bytes read from a streamed response."""
+        self._count("bytes", amount)
+
+    def backoff_delay(self, attempt, response=None):
+        """
+        Returns the delay before the next attempt.
+
+        The server's Retry-After header wins when present, otherwise exponential
+        backoff with jitter is used.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    delay = float(retry_after)
+                except ValueError:
+                    try:
+                        delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    except (TypeError, ValueError):
+                        delay = None
+                if delay is not None:
+                    return min(max(delay, 0.0), self.backoff_max)
+
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get(self, url, retries=None, stream=False, budget=None):
+        """
+        Makes a GET request to the specified URL with retries on failure.
+
+        Args:
+            url (str): The URL to request.
+            retries (int): Number of attempts (defaults to the transport setting).
+            stream (bool): Stream the response body instead of reading it eagerly.
+                The response then counts as in flight until it is closed, so
+                use it as a context manager or close it once the body is read.
+            budget (RequestBudget): Budget charged for every attempt besides the
+                transport's own, e.g. the request budget of the URL's channel.
+
+        Returns:
+            Response object or None if all retries fail.
+        """
+        retries = retries or self.retries
+        host = urlparse(url).netloc
+
+        for attempt in range(retries):
+            if not self.circuit_breaker.allow(host):
+                print(f"Circuit open for {host}, skipping {url}.")
+                return None
+            if (budget and not budget.try_spend()) or (
+                self.request_budget and not self.request_budget.try_spend()
+            ):
+                self._count("over_budget")
+                print(f"Request budget spent, skipping {url}.")
+                return None
+            if attempt:
+                self._count("retries")
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+
+            response = None
+            holding_slot = False
+            self._acquire_slot()
+            try:
+                self._count("requests")
+                response = self.session.get(url, timeout=self.timeout, stream=stream)
+                if response.status_code == 200:
+                    self.circuit_breaker.record_success(host)
+                    if stream:
+                        # The body is read by the caller, who frees the slot by closing it
+                        self._release_on_close(response)
+                        holding_slot = True
+                    else:
+                        self._count("bytes", len(response.content))
+                    return response
+
+                print(
+                    f"Attempt {attempt + 1}: Received status code {response.status_code}."
+                )
+                # Discarded, give its connection back to the pool
+                response.close()
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Client errors such as 404 will not succeed on a retry,
+                    # but the host itself is answering
+                    self.circuit_breaker.record_success(host)
+                    break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                print(f"Attempt {attempt + 1}: Connection error: {e}")
+            finally:
+                if not holding_slot:
+                    self._release_slot()
+
+            self.circuit_breaker.record_failure(host)
+            if attempt < retries - 1:
+                # Wait before the next attempt
+                time.sleep(self.backoff_delay(attempt, response))
+
+        self._count("failures")
+        print(f"Failed to retrieve data from {url} after {attempt + 1} attempts.")
+        return None
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+# Marks the end of the queue for a worker thread
+_STOP = object()
+
+
+class ImageDownloadPipeline:
+    """
+    Queue-fed image download stage with content-hash deduplication.
+
+    Every unique image is stored once under `store_folder` as `<sha256>.jpg` and
+    hard-linked to each post image path that uses it. Images whose post path
+    already exists are skipped.
+    """
+
+    def __init__(
+        self,
+        transport,
+        store_folder="../../data/tg_image/by_hash",
+        workers=4,
+        queue_size=256,
+        chunk_size=256 * 1024,
+    ):
+        """
+        Args:
+            transport (HttpTransport): Transport used to fetch the images.
+            store_folder (str): Folder holding one file per unique image.
+            workers (int): Number of download threads started by start().
+            queue_size (int): Maximum number of queued downloads before submit() blocks.
+            chunk_size (int): Buffer size used when streaming images to disk.
+        """
+        self.transport = transport
+        self.store_folder = store_folder
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {"downloaded": 0, "deduplicated": 0, "skipped": 0, "failed": 0}
+        self._threads = []
+        # Image URLs already stored during this run, mapped to their stored file
+        self._stored_urls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self):
+        """Starts the download threads; until then submit() downloads inline."""
+        os.makedirs(self.store_folder, exist_ok=True)
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self):
+        """Waits for every queued download to finish and stops the threads."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, image_url, image_path, budget=None):
+        """
+        Schedules the download of `image_url` to `image_path`.
+
+        Blocks while the queue is full so the scraper can't outrun the downloads.
+        The download's requests are charged to `budget` if given.
+        """
+        if self._threads:
+            self.queue.put((image_url, image_path, budget))
+        else:
+            self.download(image_url, image_path, budget)
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.download(*item)
+            except Exception as e:
+                print(f"Failed to download image {item[0]}: {e}")
+                self._count("failed")
+
+    def _link(self, stored_path, image_path):
+        """Links the stored image to the post image path, copying if links aren't supported."""
+        folder = os.path.dirname(image_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        try:
+            os.link(stored_path, image_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(stored_path, image_path)
+
+    def download(self, image_url, image_path, budget=None):
+        """Downloads a single image, reusing a stored copy of identical content."""
+        if os.path.exists(image_path):
+            self._count("skipped")
+            return
+
+        with self._lock:
+            stored_path = self._stored_urls.get(image_url)
+        if stored_path and os.path.exists(stored_path):
+            self._link(stored_path, image_path)
+            self._count("deduplicated")
+            return
+
+        response = self.transport.get(image_url, stream=True, budget=budget)
+        if response is None:
+            self._count("failed")
+            return
+
+        # Stream into a temporary file while hashing the content
+        os.makedirs(self.store_folder, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.store_folder, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb", buffering=self.chunk_size) as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self.transport.add_bytes(len(chunk))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        finally:
+            response.close()
+
+        stored_path = os.path.join(self.store_folder, f"{digest.hexdigest()}.jpg")
+        if os.path.exists(stored_path):
+            # The same image was already stored for another post
+            os.remove(temp_path)
+            self._count("deduplicated")
+        else:
+            os.replace(temp_path, stored_path)
+            self._count("downloaded")
+
+        with self._lock:
+            self._stored_urls[image_url] = stored_path
+        self._link(stored_path, image_path)
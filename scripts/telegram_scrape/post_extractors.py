@@ -0,0 +1,205 @@
+import re
+from bs4 import BeautifulSoup
+
+# Matches the image URL inside a photo wrap's inline background-image style
+IMAGE_URL_PATTERN = re.compile(r"url\(\'(.*?)\'\)")
+
+
+class BeautifulSoupExtractor:
+    """Extracts Telegram posts with BeautifulSoup and the pure-Python html.parser."""
+
+    name = "html.parser"
+
+    def parse_page(self, html):
+        """
+        Extracts the channel name and every post on a t.me/s page.
+
+        Args:
+            html (str): The HTML content of the page.
+
+        Returns:
+            tuple: (channel_name, posts) where posts is a list of dicts with a
+            'data_post' key plus the fields found for that post.
+        """
+        soup = BeautifulSoup(html, "html.parser")
+
+        header_title = soup.find(class_="tgme_header_title")
+        channel_name = header_title.get_text(strip=True) if header_title else None
+
+        posts = [
+            self.extract_post(post_container)
+            for post_container in soup.find_all("div", class_="tgme_widget_message")
+            if post_container.get("data-post")
+        ]
+        return channel_name, posts
+
+    def extract_post(self, post_container):
+        """Extracts the fields of a single 'tgme_widget_message' element."""
+        post = {"data_post": post_container.get("data-post")}
+
+        # Find the div with class 'tgme_widget_message_text js-message_text before_footer'
+        message_div = post_container.find("div", class_="tgme_widget_message_text")
+        if message_div:
+            # Remove emoji tags
+            for emoji in message_div.find_all("i", class_="emoji"):
+                emoji.decompose()
+            post["message_text"] = message_div.get_text(strip=True)
+
+        # Extract view count
+        views_span = post_container.find("span", class_="tgme_widget_message_views")
+        if views_span:
+            post["views"] = views_span.get_text(strip=True)
+
+        # Extract author and timestamp
+        message_meta = post_container.find("span", class_="tgme_widget_message_meta")
+        if message_meta:
+            author = message_meta.find("span", class_="tgme_widget_message_from_author")
+            timestamp = message_meta.find("time")
+            if author:
+                post["author"] = author.get_text(strip=True)
+            if timestamp:
+                post["timestamp"] = timestamp.get("datetime")
+
+        # Extract image URLs if present
+        image_urls = []
+        for image_wrap in post_container.find_all(
+            "a", class_="tgme_widget_message_photo_wrap"
+        ):
+            match = IMAGE_URL_PATTERN.search(image_wrap.attrs.get("style", ""))
+            if match and "background-image" in image_wrap["style"]:
+                image_urls.append(match.group(1))
+        if image_urls:
+            post["image_urls"] = image_urls
+
+        return post
+
+
+def _has_class(class_name):
+    """XPath predicate matching elements whose class list contains `class_name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+class LxmlExtractor:
+    """Extracts Telegram posts with the C-backed lxml parser and XPath lookups."""
+
+    name = "lxml"
+
+    # Elements whose text BeautifulSoup's get_text() leaves out
+    _skipped_tags = {"script", "style", "template"}
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+
+        self._parse = lxml_html.fromstring
+        self._header_title = etree.XPath(f"(//*[{_has_class('tgme_header_title')}])[1]")
+        self._post_containers = etree.XPath(
+            f"//div[{_has_class('tgme_widget_message')}][@data-post]"
+        )
+        self._message_div = etree.XPath(
+            f"(.//div[{_has_class('tgme_widget_message_text')}])[1]"
+        )
+        self._views_span = etree.XPath(
+            f"(.//span[{_has_class('tgme_widget_message_views')}])[1]"
+        )
+        self._message_meta = etree.XPath(
+            f"(.//span[{_has_class('tgme_widget_message_meta')}])[1]"
+        )
+        self._author = etree.XPath(
+            f"(.//span[{_has_class('tgme_widget_message_from_author')}])[1]"
+        )
+        self._time = etree.XPath("(.//time)[1]")
+        self._image_wraps = etree.XPath(
+            f".//a[{_has_class('tgme_widget_message_photo_wrap')}]"
+        )
+
+    def _get_text(self, element, skip_emoji=False):
+        """Mirrors BeautifulSoup's get_text(strip=True), optionally dropping emoji tags."""
+        parts = []
+
+        def walk(node):
+            # Comments and processing instructions have a non-string tag
+            if (
+                isinstance(node.tag, str)
+                and node.tag not in self._skipped_tags
+                and not (skip_emoji and node.tag == "i" and "emoji" in node.classes)
+            ):
+                if node.text:
+                    parts.append(node.text)
+                for child in node:
+                    walk(child)
+                    if child.tail:
+                        parts.append(child.tail)
+
+        walk(element)
+        return "".join(part.strip() for part in parts if part.strip())
+
+    def parse_page(self, html):
+        """
+        Extracts the channel name and every post on a t.me/s page.
+
+        Args:
+            html (str): The HTML content of the page.
+
+        Returns:
+            tuple: (channel_name, posts) where posts is a list of dicts with a
+            'data_post' key plus the fields found for that post.
+        """
+        root = self._parse(html)
+
+        header_title = self._header_title(root)
+        channel_name = self._get_text(header_title[0]) if header_title else None
+
+        posts = [
+            self.extract_post(post_container)
+            for post_container in self._post_containers(root)
+            if post_container.get("data-post")
+        ]
+        return channel_name, posts
+
+    def extract_post(self, post_container):
+        """Extracts the fields of a single 'tgme_widget_message' element."""
+        post = {"data_post": post_container.get("data-post")}
+
+        message_div = self._message_div(post_container)
+        if message_div:
+            post["message_text"] = self._get_text(message_div[0], skip_emoji=True)
+
+        views_span = self._views_span(post_container)
+        if views_span:
+            post["views"] = self._get_text(views_span[0])
+
+        message_meta = self._message_meta(post_container)
+        if message_meta:
+            author = self._author(message_meta[0])
+            timestamp = self._time(message_meta[0])
+            if author:
+                post["author"] = self._get_text(author[0])
+            if timestamp:
+                post["timestamp"] = timestamp[0].get("datetime")
+
+        image_urls = []
+        for image_wrap in self._image_wraps(post_container):
+            style = image_wrap.get("style", "")
+            match = IMAGE_URL_PATTERN.search(style)
+            if match and "background-image" in style:
+                image_urls.append(match.group(1))
+        if image_urls:
+            post["image_urls"] = image_urls
+
+        return post
+
+
+# Registry of available extraction backends, keyed by name
+EXTRACTORS = {
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name="lxml"):
+    """Returns an instance of the extraction backend registered under `name`."""
+    if name not in EXTRACTORS:
+        raise ValueError(
+            f"Unknown extractor '{name}', expected one of {sorted(EXTRACTORS)}"
+        )
+    return EXTRACTORS[name]()
@@ -0,0 +1,184 @@
+import abc
+import csv
+import fcntl
+import os
+import threading
+import time
+import uuid
+
+
+class BufferedPostSink(abc.ABC):
+    """
+    Buffers scraped records and writes them out in batches.
+
+    A batch is written once `flush_rows` records are buffered or `flush_interval`
+    seconds have passed since the last write, whichever comes first, which bounds
+    both memory use and the records lost if the crawler crashes.
+    """
+
+    def __init__(self, flush_rows=1000, flush_interval=30):
+        """
+        Args:
+            flush_rows (int): Number of buffered records that triggers a write.
+            flush_interval (float): Maximum seconds a record stays buffered.
+        """
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def write(self, record):
+        """Adds a record to the buffer, writing the batch when it is full."""
+        with self._lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered records."""
+        with self._lock:
+            records, self._buffer = self._buffer, []
+            if records:
+                self._write_batch(records)
+                self.rows_written += len(records)
+
+    def close(self):
+        """Stops the flush timer and writes the remaining records."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+
+    @abc.abstractmethod
+    def _write_batch(self, records):
+        """Writes one batch of records."""
+
+
+class CsvPostSink(BufferedPostSink):
+    """
+    Appends batches of records to a CSV file, opening it once per batch.
+
+    Every batch is written under an exclusive flock, so crawler processes can
+    share the file without interleaving rows or writing the header twice.
+    """
+
+    def __init__(self, file_name, csv_columns, flush_rows=1000, flush_interval=30):
+        """
+        Args:
+            file_name (str): The CSV file to append to.
+            csv_columns (list): The CSV header.
+        """
+        self.file_name = file_name
+        self.csv_columns = csv_columns
+        super().__init__(flush_rows, flush_interval)
+
+    def _write_batch(self, records):
+        with open(self.file_name, mode="a", newline="", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                writer = csv.DictWriter(
+                    file, fieldnames=self.csv_columns, extrasaction="ignore"
+                )
+                # Checked under the lock, another process may have just created it
+                if file.seek(0, os.SEEK_END) == 0:
+                    writer.writeheader()
+                writer.writerows(records)
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class ParquetPostSink(BufferedPostSink):
+    """
+    Writes batches of records as a Parquet dataset partitioned by channel and date.
+
+    Files are laid out as `<root>/channel_username=<name>/date=<YYYY-MM-DD>/` and
+    `image_urls`/`image_paths` are stored as real list columns, so the dataset
+    can be read back directly with `pd.read_parquet(root)`.
+
+    Every flush writes one file per partition it has records for, which keeps
+    the flushed records durable but leaves many small files. On close, the
+    files this sink wrote into a partition are coalesced into one.
+    """
+
+    def __init__(
+        self, root="../../data/telegram_posts", flush_rows=5000, flush_interval=60
+    ):
+        """
+        Args:
+            root (str): Root folder of the Parquet dataset.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.root = root
+        # Partition folder -> files this sink wrote into it
+        self._written = {}
+        self.schema = pa.schema(
+            [
+                ("post_id", pa.string()),
+                ("channel_name", pa.string()),
+                ("channel_username", pa.string()),
+                ("author", pa.string()),
+                ("message_text", pa.string()),
+                ("views", pa.string()),
+                ("timestamp", pa.string()),
+                ("image_urls", pa.list_(pa.string())),
+                ("image_paths", pa.list_(pa.string())),
+                ("source", pa.string()),
+                ("date", pa.string()),
+            ]
+        )
+        super().__init__(flush_rows, flush_interval)
+
+    def _write_batch(self, records):
+        rows = []
+        for record in records:
+            row = {name: record.get(name) for name in self.schema.names}
+            # Partition by the day the post was published
+            timestamp = record.get("timestamp")
+            row["date"] = timestamp[:10] if timestamp else "unknown"
+            rows.append(row)
+
+        table = self._pa.Table.from_pylist(rows, schema=self.schema)
+        self._pq.write_to_dataset(
+            table,
+            self.root,
+            partition_cols=["channel_username", "date"],
+            basename_template=f"part-{int(time.time())}-{uuid.uuid4().hex}-{{i}}.parquet",
+            file_visitor=self._visit_file,
+        )
+
+    def _visit_file(self, written_file):
+        folder, _ = os.path.split(written_file.path)
+        self._written.setdefault(folder, []).append(written_file.path)
+
+    def close(self):
+        """Writes the remaining records and coalesces the files of every partition."""
+        super().close()
+        for folder, paths in self._written.items():
+            if len(paths) > 1:
+                self._coalesce(folder, paths)
+        self._written = {}
+
+    def _coalesce(self, folder, paths):
+        """Rewrites the files into one and removes them."""
+        # The files hold every column but the partition keys
+        table = self._pa.concat_tables([self._pq.read_table(path) for path in paths])
+        name = f"part-{int(time.time())}-{uuid.uuid4().hex}-0.parquet"
+        # Dataset readers skip dot files, so the partial file is never read
+        temp_path = os.path.join(folder, f".{name}")
+        self._pq.write_table(table, temp_path)
+        os.replace(temp_path, os.path.join(folder, name))
+        for path in paths:
+            os.remove(path)
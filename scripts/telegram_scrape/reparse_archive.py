@@ -0,0 +1,133 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from html_archive import HtmlArchive, read_segment
+from post_sink import CsvPostSink, ParquetPostSink
+from telegram_scrape import IMAGE_CSV_COLUMNS, POST_CSV_COLUMNS, TelegramScraper
+
+
+# The worker's scraper, built once by _init_worker
+_scraper = None
+
+
+def _init_worker(extractor, record_extractors):
+    """Builds the scraper a worker process parses all its segments with."""
+    global _scraper
+    # Only its extractor and record builders are used, it never issues requests
+    _scraper = TelegramScraper(
+        None, extractor=extractor, record_extractors=record_extractors
+    )
+
+
+def parse_segment(path, channel):
+    """
+    Re-parses every page of one archive segment in a worker process.
+
+    Returns:
+        list: (post_number, fetched_at, record) for every post found in the segment.
+    """
+    scraper = _scraper
+    scraper.telegram_username = channel
+    results = []
+    for page in read_segment(path):
+        channel_name, page_posts = scraper.extractor.parse_page(page["html"])
+        for post_number, post in scraper.channel_posts(page_posts):
+            # Post pages also show neighbouring posts, only keep the requested one
+            if page["kind"] == "post" and post_number != page["post_id"]:
+                continue
+
+            record = scraper.build_post_record(
+                post, channel, post_number, download_images=False
+            )
+            if not record:
+                continue
+            record["post_id"] = f"{channel}_{post_number}"
+            record["channel_name"] = f"{channel_name}"
+            record["channel_username"] = channel
+            record["source"] = "Telegram"
+            results.append((post_number, page["fetched_at"], record))
+    return results
+
+
+def reparse_archive(archive, scraper, post_sink, image_sink, workers, channels=None):
+    """
+    Rebuilds the scraped dataset from the archive, one channel at a time.
+
+    Segments are parsed in parallel; when a post was archived more than once the
+    most recently fetched copy wins.
+    """
+    total = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(scraper.extractor.name, tuple(scraper.record_extractors)),
+    ) as executor:
+        for channel, paths in archive.segments(channels).items():
+            start = time.perf_counter()
+            latest = {}
+            parse = partial(parse_segment, channel=channel)
+            for results in executor.map(parse, paths):
+                for post_number, fetched_at, record in results:
+                    if (
+                        post_number not in latest
+                        or latest[post_number][0] <= fetched_at
+                    ):
+                        latest[post_number] = (fetched_at, record)
+
+            for post_number in sorted(latest):
+                scraper.save_outputs(latest[post_number][1])
+            total += len(latest)
+            print(
+                f"{channel}: {len(latest)} posts from {len(paths)} segments "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+
+    post_sink.close()
+    image_sink.close()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the scraped dataset from the raw HTML archive."
+    )
+    parser.add_argument("--archive", default="../../data/html_archive")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--extractor", default="lxml")
+    parser.add_argument(
+        "--record-extractors", nargs="+", default=["text", "meta", "images"]
+    )
+    parser.add_argument("--channels", nargs="+", help="Only re-parse these channels")
+    parser.add_argument(
+        "--output-format", choices=["csv", "parquet"], default="csv"
+    )
+    parser.add_argument("--posts-output", default="../../data/reparsed_posts")
+    parser.add_argument("--images-output", default="../../data/reparsed_image_posts")
+    args = parser.parse_args()
+
+    if args.output_format == "parquet":
+        post_sink = ParquetPostSink(args.posts_output)
+        image_sink = ParquetPostSink(args.images_output)
+    else:
+        post_sink = CsvPostSink(f"{args.posts_output}.csv", POST_CSV_COLUMNS)
+        image_sink = CsvPostSink(f"{args.images_output}.csv", IMAGE_CSV_COLUMNS)
+
+    # Only used to route records to the sinks, it never issues requests
+    scraper = TelegramScraper(
+        None,
+        extractor=args.extractor,
+        record_extractors=args.record_extractors,
+        post_sink=post_sink,
+        image_sink=image_sink,
+    )
+    total = reparse_archive(
+        HtmlArchive(args.archive),
+        scraper,
+        post_sink,
+        image_sink,
+        args.workers,
+        args.channels,
+    )
+    print(f"Re-parsed {total} posts.")
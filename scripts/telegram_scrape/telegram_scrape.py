@@ -1,46 +1,113 @@
 import os
-import time
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
+import multiprocessing
+from functools import partial
 import re  # For extracting numerical parts from the post IDs
 import csv  # For saving data to CSV
+from html_archive import HtmlArchive
+from http_transport import HttpTransport
+from image_downloader import ImageDownloadPipeline
+from post_extractors import get_extractor
+from post_sink import CsvPostSink, ParquetPostSink
+from tombstones import TombstoneIndex
+from async_crawl import HostRateLimiter, SharedHostRateLimiter, crawl_in_order
+from crawl_state import CrawlStateStore
+from crawl_scheduler import (
+    CrawlScheduler,
+    CrawlStep,
+    LeaseFile,
+    RequestBudget,
+    load_channel_config,
+)
+
+# Post fields produced by each of the record extractors
+RECORD_EXTRACTORS = {
+    "text": ("message_text",),
+    "meta": ("views", "author", "timestamp"),
+    "images": ("image_urls", "image_paths"),
+}
+
+# Columns of the post and image CSV outputs
+POST_CSV_COLUMNS = [
+    "post_id",
+    "channel_name",
+    "channel_username",
+    "author",
+    "message_text",
+    "views",
+    "timestamp",
+    "image_urls",
+    "image_paths",
+    "source",
+]
+IMAGE_CSV_COLUMNS = [
+    "post_id",
+    "channel_name",
+    "channel_username",
+    "message_text",
+    "views",
+    "timestamp",
+    "image_urls",
+    "image_paths",
+    "source",
+]
 
 
 class TelegramScraper:
-    def __init__(self, telegram_username):
+    def __init__(
+        self,
+        telegram_username,
+        transport=None,
+        extractor="lxml",
+        tombstones=None,
+        image_downloader=None,
+        record_extractors=("text", "meta", "images"),
+        post_sink=None,
+        image_sink=None,
+        archive=None,
+        request_budget=None,
+    ):
         # Initialize the class with a single Telegram username
         self.telegram_username = telegram_username
-
-    def make_request_with_retries(self, url, retries=3, delay=3):
+        # Share one pooled transport across scrapers to reuse connections
+        self.transport = transport or HttpTransport()
+        # HTML extraction backend, see post_extractors.EXTRACTORS
+        self.extractor = get_extractor(extractor)
+        # Optional TombstoneIndex recording posts that turned out to be missing
+        self.tombstones = tombstones
+        # Download stage for post images; downloads inline unless started
+        self.image_downloader = image_downloader or ImageDownloadPipeline(
+            self.transport
+        )
+        # Record extractors to run on every post, see RECORD_EXTRACTORS
+        unknown = set(record_extractors) - set(RECORD_EXTRACTORS)
+        if unknown:
+            raise ValueError(f"Unknown record extractors: {sorted(unknown)}")
+        self.record_extractors = set(record_extractors)
+        # Optional buffered sinks (see post_sink) replacing the per-row CSV appends
+        self.post_sink = post_sink
+        self.image_sink = image_sink
+        # Optional HtmlArchive keeping every fetched page for offline re-parsing
+        self.archive = archive
+        # Optional RequestBudget of the channel, charged for its page and image requests
+        self.request_budget = request_budget
+
+    def make_request_with_retries(self, url, retries=None, stream=False):
         """
         Makes a GET request to the specified URL with retries on failure.
 
         Args:
             url (str): The URL to request.
-            retries (int): Number of retries before giving up.
-            delay (int): Delay in seconds between retries.
+            retries (int): Number of attempts (defaults to the transport setting).
+            stream (bool): Stream the response body instead of reading it eagerly.
 
         Returns:
             Response object or None if all retries fail.
         """
-        for attempt in range(retries):
-            try:
-                response = requests.get(url)
-                # Check if the request was successful
-                if response.status_code == 200:
-                    return response
-                else:
-                    print(
-                        f"Attempt {attempt + 1}: Received status code {response.status_code}."
-                    )
-            except requests.ConnectionError as e:
-                print(f"Attempt {attempt + 1}: Connection error: {e}")
-
-            # Wait before the next attempt
-            time.sleep(delay)
-
-        print(f"Failed to retrieve data from {url} after {retries} attempts.")
-        return None
+        return self.transport.get(
+            url, retries=retries, stream=stream, budget=self.request_budget
+        )
 
     def scrape_data_posts(self):
         all_posts = []
@@ -51,28 +118,16 @@ class TelegramScraper:
         # requests.get(url)
 
         # Check if the request was successful
-        if response.status_code == 200:
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Extract all elements with 'data-post' attribute
-            post_elements = soup.find_all("div", {"class": "tgme_widget_message"})
-            # channel_name=soup.find("div", {"class": "tgme_widget_message"})
-            # Find the element by class name
-            header_title = soup.find(class_="tgme_header_title")
-            channel_name = None
-            # Extract the text
-            if header_title:
-                text = header_title.get_text(strip=True)
-                print(text)
-                channel_name = text
+        if response is not None:
+            # Parse the HTML content and extract every post on the page
+            channel_name, posts = self.extractor.parse_page(response.text)
+            if channel_name:
+                print(channel_name)
             else:
                 print("Element not found.")
 
             # Collect data-post values
-            post_ids = [
-                post.get("data-post") for post in post_elements if post.get("data-post")
-            ]
+            post_ids = [post["data_post"] for post in posts]
 
             # Store the results for the current username
             all_posts = {"post_ids": post_ids, "channel_name": channel_name}
@@ -101,149 +156,262 @@ class TelegramScraper:
         # Find and return the largest post number
         return {"largest": max(post_numbers), "channel_name": posts.get("channel_name")}
 
+    def image_path(self, img_name, index, folder="../../data/tg_image"):
+        """Return the path an image of a post is stored at."""
+        # Set the image filename (include index in the name)
+        image_name = f"{img_name}_{index}.jpg"
+        return os.path.join(folder, image_name)
+
     def download_image(self, img_name, image_url, index, folder="../../data/tg_image"):
         # Create folder if it doesn't exist
         if not os.path.exists(folder):
             os.makedirs(folder)
 
-        # Set the image filename (include index in the name)
-        image_name = f"{img_name}_{index}.jpg"
-        image_path = os.path.join(folder, image_name)
+        image_path = self.image_path(img_name, index, folder)
 
-        # Download and save the image
-        response = self.make_request_with_retries(image_url)
-        # requests.get(image_url, stream=True)
-        if response.status_code == 200:
-            with open(image_path, "wb") as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+        # Hand the image to the download stage
+        self.image_downloader.submit(image_url, image_path, self.request_budget)
 
         # Return the path where the image is stored
         return image_path
 
+    def build_post_record(self, post, username, post_id, download_images=True):
+        """
+        Builds the scraped record for a post extracted from the page.
+
+        Args:
+            post (dict): The fields extracted by the extraction backend.
+            username (str): The channel username the post belongs to.
+            post_id (int): The post number within the channel.
+            download_images (bool): Download the post images; when False only
+                their paths are filled in (e.g. when re-parsing archived pages).
+
+        Returns:
+            dict: A dictionary containing the post details.
+        """
+        scraped_data = {
+            key: post[key]
+            for name in ("text", "meta")
+            if name in self.record_extractors
+            for key in RECORD_EXTRACTORS[name]
+            if key in post
+        }
+        if "text" in self.record_extractors and "message_text" not in post:
+            print("no message div")
+
+        if "images" not in self.record_extractors:
+            return scraped_data
+
+        # Download every image found in the post
+        image_urls = post.get("image_urls", [])
+        image_paths = [
+            (
+                self.download_image(f"{username}_{post_id}", image_url, index)
+                if download_images
+                else self.image_path(f"{username}_{post_id}", index)
+            )
+            for index, image_url in enumerate(image_urls)
+        ]
+
+        if image_urls:
+            scraped_data["image_urls"] = image_urls
+            # Image records are partitioned by date, even without the meta extractor
+            if "timestamp" in post:
+                scraped_data.setdefault("timestamp", post["timestamp"])
+        if image_paths:
+            scraped_data["image_paths"] = image_paths
+        return scraped_data
+
     def scrape_post_content(self, username, post_id):
-        data_post = f"{username}/{post_id}"
-        print("data_post: ", data_post)
         """
         Scrapes a Telegram post based on the provided user/post_id.
 
         Args:
-            html_content (str): The HTML content of the page to scrape.
-            user_post_id (str): The user and post id to match (e.g., 'yetenaweg/1175').
+            username (str): The channel username (e.g., 'yetenaweg').
+            post_id (int): The post number to scrape (e.g., 1175).
 
         Returns:
             dict: A dictionary containing post details if matched, otherwise None.
         """
+        data_post = f"{username}/{post_id}"
+        print("data_post: ", data_post)
         url = f"https://t.me/s/{username}/{post_id}"
         response = self.make_request_with_retries(url)
         # requests.get(url)
+        if response is None:
+            return None
+        if self.archive:
+            self.archive.append(username, post_id, url, response.text)
+
+        # Parse the HTML content and find the post with the matching data-post attribute
+        _, posts = self.extractor.parse_page(response.text)
+        for post in posts:
+            if post["data_post"] == data_post:
+                if self.tombstones:
+                    self.tombstones.remove(username, post_id)
+                return self.build_post_record(post, username, post_id)
+
+        print("no id")
+        if self.tombstones:
+            self.tombstones.add(username, post_id)
+        # Return None if no matching post was found
+        return None
 
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, "html.parser")
-        # print(soup)
-        # Find the post container with the matching data-post attribute
-        post_container = soup.find(
-            "div", class_="tgme_widget_message", attrs={"data-post": data_post}
-        )
+    def scrape_feed_page(self, before=None, after=None, skip=()):
+        """
+        Scrapes every post on one page of the channel feed.
 
-        if post_container:
+        Args:
+            before (int): Only return posts older than this post number.
+            after (int): Only return posts newer than this post number.
+            skip (container): Post numbers to leave unparsed (e.g. already scraped).
 
-            # Extract the message text from the 'tgme_widget_message_text' div
-            # message_text_div = soup.find("div", class_="tgme_widget_message_text")
+        Returns:
+            tuple: (post_numbers, posts) where post_numbers lists every post number
+            found on the page and posts is a list of (post_number, data) pairs for
+            the posts that were parsed, or None if the page could not be fetched.
+        """
+        username = self.telegram_username
+        url = f"https://t.me/s/{username}"
+        if before is not None:
+            url += f"?before={before}"
+        elif after is not None:
+            url += f"?after={after}"
+        print("feed page: ", url)
 
-            # Initialize an empty dictionary to store the scraped data
-            scraped_data = {}
-            # Find the div with class 'tgme_widget_message_text js-message_text before_footer'
-            message_div = post_container.find("div", class_="tgme_widget_message_text")
-            if message_div:
+        response = self.make_request_with_retries(url)
+        if response is None:
+            return None
 
-                # Remove emoji tags
-                for emoji in message_div.find_all("i", class_="emoji"):
-                    emoji.decompose()
+        _, page_posts = self.extractor.parse_page(response.text)
+        post_numbers = []
+        posts = []
+        for post_number, post in self.channel_posts(page_posts):
+            post_numbers.append(post_number)
+            if post_number in skip:
+                continue
+            posts.append(
+                (post_number, self.build_post_record(post, username, post_number))
+            )
 
-                # Extract the cleaned text
-                message_text = message_div.get_text(strip=True)
-                scraped_data["message_text"] = message_text
-            else:
-                print("no message div")
-            # Extract view count
-            views_span = post_container.find("span", class_="tgme_widget_message_views")
-            if views_span:
-                scraped_data["views"] = views_span.get_text(strip=True)
-
-            # Extract author and timestamp
-            message_meta = post_container.find(
-                "span", class_="tgme_widget_message_meta"
+        if self.archive:
+            # Key the page by its oldest post so it lands in the matching segment
+            self.archive.append(
+                username,
+                min(post_numbers, default=after or before or 0),
+                url,
+                response.text,
+                kind="feed",
             )
-            if message_meta:
-                author = message_meta.find(
-                    "span", class_="tgme_widget_message_from_author"
-                )
-                timestamp = message_meta.find("time")
 
-                if author:
-                    scraped_data["author"] = author.get_text(strip=True)
+        return post_numbers, posts
 
-                if timestamp:
-                    scraped_data["timestamp"] = timestamp.get("datetime")
+    def channel_posts(self, page_posts):
+        """
+        Yields (post_number, post) for the extracted posts that belong to this channel.
 
-            # Extract image URL if present
-            # Extract image URLs if present
-            image_wraps = post_container.find_all(
-                "a", class_="tgme_widget_message_photo_wrap"
-            )
+        Feeds can embed posts forwarded from other channels, which are left out.
+        """
+        for post in page_posts:
+            match = re.match(r"([^/]+)/(\d+)$", post["data_post"])
+            if match and match.group(1).lower() == self.telegram_username.lower():
+                yield int(match.group(2)), post
 
-            # Initialize a list to store image URLs
-            image_urls = []
-            image_paths = []
-
-            # Loop through all found image wraps and extract the URLs
-            # for image_wrap in image_wraps:
-            for index, image_wrap in enumerate(image_wraps):
-
-                if "background-image" in image_wrap.attrs.get("style", ""):
-                    image_url = re.search(
-                        r"url\(\'(.*?)\'\)", image_wrap["style"]
-                    ).group(1)
-                    image_urls.append(image_url)
-                    # image_path = download_image(image_url, index)
-                    image_path = self.download_image(
-                        f"{username}_{post_id}", image_url, index
-                    )
-
-                    image_paths.append(image_path)
-
-            if image_urls:
-                scraped_data["image_urls"] = image_urls
-            if image_paths:
-                scraped_data["image_paths"] = image_paths
-            return scraped_data
+    def feed_page_posts(self, page, cursor, before=None):
+        """
+        Selects the posts of a feed page that continue a forward feed walk.
 
-        else:
-            print("no id")
-            # Return None if no matching post was found
-            return None
+        Args:
+            page (tuple): The result of scrape_feed_page, or None if it failed.
+            cursor (int): The newest post number already walked past.
+            before (int): Stop once this post number is reached (exclusive).
+
+        Returns:
+            tuple: (posts, next_cursor) where posts lists (post_number, data) in
+            ascending order and next_cursor is None once the walk is finished.
+        """
+        if page is None:
+            print(f"Stopping feed walk for {self.telegram_username} at {cursor}")
+            return [], None
+
+        post_numbers, posts = page
+        newer = [number for number in post_numbers if number > cursor]
+        if not newer:
+            # No posts beyond the cursor: the end of the channel was reached
+            return [], None
+
+        selected = []
+        for post_number, data in sorted(posts, key=lambda post: post[0]):
+            if post_number <= cursor:
+                continue
+            if before is not None and post_number >= before:
+                return selected, None
+            selected.append((post_number, data))
+
+        next_cursor = max(newer)
+        if before is not None and next_cursor >= before - 1:
+            return selected, None
+        return selected, next_cursor
+
+    def iter_feed_posts(self, after=0, before=None, skip=()):
+        """
+        Walks the channel feed forward with the `?after=` cursor, one page per request.
 
-    def save_to_csv(self, data, file_name="../../data/telegram_data.csv"):
+        Args:
+            after (int): Start with the first post newer than this post number.
+            before (int): Stop once this post number is reached (exclusive).
+            skip (container): Post numbers to leave unparsed (e.g. already scraped).
+
+        Yields:
+            tuple: (post_number, data) for every post on each page, in ascending order.
+        """
+        cursor = after
+        while cursor is not None and (before is None or cursor < before - 1):
+            page = self.scrape_feed_page(after=cursor, skip=skip)
+            posts, cursor = self.feed_page_posts(page, cursor, before)
+            yield from posts
+
+    def crawl_posts_async(
+        self, post_ids, handle_result, concurrency=8, requests_per_second=None
+    ):
+        """
+        Scrapes many posts concurrently while handing results off in order.
+
+        Args:
+            post_ids (iterable): Post numbers to scrape, in ascending order.
+            handle_result (callable): Called as handle_result(post_id, result) in
+                post order, e.g. to append the result to the CSV sink.
+            concurrency (int): Maximum number of requests in flight.
+            requests_per_second (float): Maximum request rate per host; when None
+                the transport's current rate limiter is kept.
+
+        Returns:
+            int: The number of posts processed.
+        """
+        if requests_per_second is not None:
+            self.transport.rate_limiter = HostRateLimiter(requests_per_second)
+        username = self.telegram_username
+        return asyncio.run(
+            crawl_in_order(
+                lambda post_id: self.scrape_post_content(username, post_id),
+                post_ids,
+                handle_result,
+                concurrency=concurrency,
+            )
+        )
+
+    def save_to_csv(
+        self, data, file_name="../../data/telegram_data.csv", csv_columns=None
+    ):
         """
         Save scraped data to a CSV file.
         Args:
             data (dict): The scraped post data.
             file_name (str): The name of the CSV file (default is 'telegram_data.csv').
+            csv_columns (list): The CSV header (default is POST_CSV_COLUMNS).
         """
         # Define the CSV header
-        csv_columns = [
-            "post_id",
-            "channel_name",
-            "channel_username",
-            "author",
-            "message_text",
-            "views",
-            "timestamp",
-            "image_urls",
-            "image_paths",
-            "source",
-        ]
+        csv_columns = csv_columns or POST_CSV_COLUMNS
 
         # Check if the file exists
         file_exists = os.path.isfile(file_name)
@@ -258,7 +426,46 @@ class TelegramScraper:
 
             # Write the row of data
             writer.writerow(data)
-            
+
+    def save_outputs(self, data):
+        """
+        Save a scraped post to every output enabled by the record extractors.
+
+        Text and meta fields go to the post output ('telegram_data.csv' unless a
+        post sink is set), image fields to the image output
+        ('telegram_image_data.csv' unless an image sink is set), so one fetch
+        feeds both outputs. Posts without images are left out of the image
+        output, like the retired image scraper did.
+        """
+        if self.record_extractors & {"text", "meta"}:
+            if self.post_sink:
+                self.post_sink.write(data)
+            else:
+                self.save_to_csv(data)
+        if "images" in self.record_extractors and data.get("image_urls"):
+            image_data = {
+                key: data[key]
+                for key in (
+                    "post_id",
+                    "channel_name",
+                    "channel_username",
+                    "timestamp",
+                    "image_urls",
+                    "image_paths",
+                    "source",
+                )
+                if key in data
+            }
+            if self.image_sink:
+                self.image_sink.write(image_data)
+            else:
+                self.save_to_csv(
+                    image_data,
+                    file_name="../../data/telegram_image_data.csv",
+                    csv_columns=IMAGE_CSV_COLUMNS,
+                )
+
+
 def load_scraped_posts(file_name="../../data/telegram_data.csv"):
     """
     Load previously scraped post_ids from the CSV file.
@@ -279,35 +486,278 @@ def load_scraped_posts(file_name="../../data/telegram_data.csv"):
     return scraped_posts
 
 
+def channel_crawl_job(
+    scraper, crawl_state, tombstones, crawl_mode="feed", batch_size=32, concurrency=8
+):
+    """
+    Crawls one channel step by step for the CrawlScheduler.
+
+    Yields a CrawlStep per feed page (or per batch of post pages in "posts" mode)
+    and receives the step's result back, saving posts and updating the crawl
+    state on the scheduler's thread.
+
+    Args:
+        scraper (TelegramScraper): The scraper of the channel.
+        crawl_state (CrawlStateStore): Watermarks and gaps from previous runs.
+        tombstones (TombstoneIndex): Posts recently found to be missing.
+        crawl_mode (str): "feed" walks the channel feed, "posts" fetches every
+            post page individually.
+        batch_size (int): Number of post pages fetched per step in "posts" mode.
+        concurrency (int): Number of post pages fetched at once within a batch;
+            the transport caps the requests in flight across all channels.
+    """
+    username = scraper.telegram_username
+    post_info = yield CrawlStep(scraper.get_largest_post_number_and_channel_name, 1)
+    if not post_info:
+        return
+    missing_post_ids = tombstones.live_tombstones(username)
+    post_count = 0
+
+    def save_result(i, result, fill_gaps=True):
+        nonlocal post_count
+        print("result: ", result)
+        if result is None:
+            crawl_state.mark_gap(username, i)
+            return
+
+        # Posts without any extracted field (e.g. no images for an
+        # images-only channel) are done but not written
+        if result:
+            result["post_id"] = f"{username}_{i}"
+            result["channel_name"] = f'{post_info.get("channel_name")}'
+            result["channel_username"] = f"{username}"
+            result["source"] = "Telegram"
+            scraper.save_outputs(result)
+            post_count += 1
+            print(f"total for {username}: ", post_count)
+        crawl_state.mark_scraped(username, i, fill_gaps=fill_gaps)
+
+    def fetch_posts(post_ids):
+        results = []
+        scraper.crawl_posts_async(
+            post_ids, lambda i, result: results.append((i, result)), concurrency
+        )
+        return results
+
+    def crawl_posts(post_ids):
+        # Skip posts recently found to be missing
+        post_ids = [i for i in post_ids if i not in missing_post_ids]
+        for start in range(0, len(post_ids), batch_size):
+            batch = post_ids[start : start + batch_size]
+            results = yield CrawlStep(partial(fetch_posts, batch), len(batch))
+            for i, result in results or [(i, None) for i in batch]:
+                save_result(i, result)
+
+    if crawl_mode == "feed":
+        # Retry known gaps individually, then walk the feed above the watermark
+        yield from crawl_posts(crawl_state.get_gaps(username))
+        before = post_info.get("largest")
+        cursor = crawl_state.get_watermark(username)
+        while cursor is not None and cursor < before - 1:
+            page = yield CrawlStep(partial(scraper.scrape_feed_page, after=cursor), 1)
+            posts, cursor = scraper.feed_page_posts(page, cursor, before)
+            for i, result in posts:
+                save_result(i, result, fill_gaps=False)
+    else:
+        # Only fetch known gaps and posts above the watermark
+        yield from crawl_posts(
+            crawl_state.pending_post_ids(username, post_info.get("largest"))
+        )
+
+    crawl_state.record_run(username)
+
+
+# Telegram usernames mapped to their crawl options; "record_extractors" picks the
+# record extractors to run on their posts, "max_requests" caps requests per run
+DEFAULT_CHANNELS = {
+    "EAHCI": {"record_extractors": ["text", "meta", "images"]},
+    "lobelia4cosmetics": {"record_extractors": ["text", "meta", "images"]},
+    "yetenaweg": {"record_extractors": ["text", "meta", "images"]},
+    "DoctorsET": {"record_extractors": ["text", "meta", "images"]},
+    "CheMed123": {"record_extractors": ["images"]},
+}
+
+
+def run_crawl(
+    config,
+    crawl_mode="feed",
+    output_format="csv",
+    archive_pages=True,
+    crawl_concurrency=8,
+    requests_per_second=5.0,
+    lease_path="../../data/crawl_leases.json",
+    shared_limits_dir=None,
+):
+    """
+    Crawls every configured channel, interleaved by a CrawlScheduler.
+
+    Every request, including retries and image downloads, goes through one
+    transport that charges the global request budget and keeps at most
+    `crawl_concurrency` requests in flight.
+
+    Args:
+        config (dict): {"channels": {username: options}, "global_max_requests": int}
+        crawl_mode (str): "feed" pages through the channel feed (about 20 posts per
+            request), "posts" fetches every post page individually.
+        output_format (str): "csv" appends to the CSV files the notebooks read,
+            "parquet" writes partitioned Parquet datasets.
+        archive_pages (bool): Keep every fetched page in the raw HTML archive.
+        crawl_concurrency (int): Number of requests in flight.
+        requests_per_second (float): Request rate per host across all channels.
+        lease_path (str): Lease file shared with other crawler processes.
+        shared_limits_dir (str): Folder of the rate limit and request budget
+            files shared with the other crawler processes of the run; the
+            limits are per process when None.
+    """
+    if shared_limits_dir:
+        rate_limiter = SharedHostRateLimiter(
+            os.path.join(shared_limits_dir, "crawl_rate.json"), requests_per_second
+        )
+        request_budget = RequestBudget(
+            config.get("global_max_requests"),
+            os.path.join(shared_limits_dir, "crawl_budget.json"),
+        )
+    else:
+        rate_limiter = HostRateLimiter(requests_per_second)
+        request_budget = RequestBudget(config.get("global_max_requests"))
+    # One pooled keep-alive transport, rate limit and budget shared by every channel
+    transport = HttpTransport(
+        pool_size=crawl_concurrency,
+        rate_limiter=rate_limiter,
+        request_budget=request_budget,
+        max_in_flight=crawl_concurrency,
+    )
+    # Deleted and missing posts that should not be requested again for a while
+    tombstones = TombstoneIndex()
+    # Background image download stage shared by every channel
+    image_downloader = ImageDownloadPipeline(transport, workers=crawl_concurrency)
+    image_downloader.start()
+    # Buffered outputs for posts and images
+    if output_format == "parquet":
+        post_sink = ParquetPostSink("../../data/telegram_posts")
+        image_sink = ParquetPostSink("../../data/telegram_image_posts")
+    else:
+        post_sink = CsvPostSink("../../data/telegram_data.csv", POST_CSV_COLUMNS)
+        image_sink = CsvPostSink(
+            "../../data/telegram_image_data.csv", IMAGE_CSV_COLUMNS
+        )
+
+    def flush_sinks():
+        post_sink.flush()
+        image_sink.flush()
+
+    archive = HtmlArchive() if archive_pages else None
+
+    # Per-channel watermarks and gaps from previous runs, committed only after
+    # the matching records have been written out
+    crawl_state = CrawlStateStore(before_commit=flush_sinks)
+    scraped_post_ids = None
+
+    def start_channel(username, options, request_budget):
+        nonlocal scraped_post_ids
+        if not crawl_state.has_channel(username):
+            # Seed the watermark once from posts scraped before the state store
+            if scraped_post_ids is None:
+                scraped_post_ids = load_scraped_posts()
+            crawl_state.bootstrap(
+                username,
+                (
+                    int(post_id.rsplit("_", 1)[1])
+                    for post_id in scraped_post_ids
+                    if post_id.rsplit("_", 1)[0] == username
+                ),
+            )
+
+        scraper = TelegramScraper(
+            username,
+            transport=transport,
+            tombstones=tombstones,
+            image_downloader=image_downloader,
+            record_extractors=options.get(
+                "record_extractors", ("text", "meta", "images")
+            ),
+            post_sink=post_sink,
+            image_sink=image_sink,
+            archive=archive,
+            request_budget=request_budget,
+        )
+        return channel_crawl_job(
+            scraper,
+            crawl_state,
+            tombstones,
+            crawl_mode=crawl_mode,
+            concurrency=crawl_concurrency,
+        )
+
+    scheduler = CrawlScheduler(
+        concurrency=crawl_concurrency,
+        request_budget=request_budget,
+        lease_file=LeaseFile(lease_path) if lease_path else None,
+    )
+    for username, options in config["channels"].items():
+        scheduler.add(
+            username,
+            partial(start_channel, username, options),
+            max_requests=options.get("max_requests"),
+        )
+    scheduler.run()
+
+    image_downloader.close()
+    crawl_state.close()
+    post_sink.close()
+    image_sink.close()
+    tombstones.close()
+    print("transport stats: ", transport.stats)
+    print("image stats: ", image_downloader.stats)
+
+
 # Example usage:
 if __name__ == "__main__":
-    # Array of Telegram usernames
-    telegram_usernames = ["EAHCI", "lobelia4cosmetics", "yetenaweg", "DoctorsET"]
-    # telegram_usernames = ["EAHCI"]
-    total_post_count = 0
-    # Load previously scraped post IDs
-    scraped_post_ids = load_scraped_posts()
-
-    for username in telegram_usernames:
-        scraper = TelegramScraper(username)  # Pass each username individually
-        post_info = scraper.get_largest_post_number_and_channel_name()
-
-        # print(f"Largest post for {username}: {largest_post}")
-        if post_info:
-            for i in range(1, post_info.get("largest")):
-                 # Skip if post_id has already been scraped
-                post_id=f"{username}_{i}"
-                if post_id in scraped_post_ids:
-                    print(f"Skipping already scraped post: {post_id}")
-                    continue
-                result = scraper.scrape_post_content(username, i)
-                print("result: ", result)
-                if result:
-                    result["post_id"] = post_id
-                    result["channel_name"] = f'{post_info.get("channel_name")}'
-                    result["channel_username"] = f"{username}"
-                    result["source"] = "Telegram"
-                    if result:
-                        scraper.save_to_csv(result)
-                        total_post_count += 1
-                        print("total: ", total_post_count)
+    parser = argparse.ArgumentParser(description="Scrape Telegram channels.")
+    parser.add_argument("--config", help="JSON or one-username-per-line channel list")
+    parser.add_argument("--mode", choices=["feed", "posts"], default="feed")
+    parser.add_argument(
+        "--output-format", choices=["csv", "parquet"], default="csv"
+    )
+    parser.add_argument("--no-archive", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=5.0)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Crawler processes sharing the channels through the lease file",
+    )
+    parser.add_argument("--lease-file", default="../../data/crawl_leases.json")
+    args = parser.parse_args()
+
+    config = (
+        load_channel_config(args.config)
+        if args.config
+        else {"channels": DEFAULT_CHANNELS, "global_max_requests": None}
+    )
+    crawl_options = dict(
+        config=config,
+        crawl_mode=args.mode,
+        output_format=args.output_format,
+        archive_pages=not args.no_archive,
+        crawl_concurrency=args.concurrency,
+        requests_per_second=args.requests_per_second,
+        lease_path=args.lease_file,
+    )
+
+    if args.processes > 1:
+        # The processes share one rate limit and request budget, started afresh
+        shared_limits_dir = os.path.dirname(args.lease_file) or "."
+        crawl_options["shared_limits_dir"] = shared_limits_dir
+        RequestBudget(path=os.path.join(shared_limits_dir, "crawl_budget.json")).reset()
+        processes = [
+            multiprocessing.Process(target=run_crawl, kwargs=crawl_options)
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        run_crawl(**crawl_options)
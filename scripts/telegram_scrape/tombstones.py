@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class TombstoneIndex:
+    """
+    SQLite-backed negative cache of deleted or missing Telegram posts.
+
+    A post number is tombstoned when its page is fetched but holds no matching
+    post (deleted posts and service messages). Tombstones are honoured for
+    `ttl_days`, after which the post is checked again.
+    """
+
+    def __init__(
+        self, db_path="../../data/post_tombstones.db", ttl_days=7, commit_every=100
+    ):
+        """
+        Args:
+            db_path (str): Path of the SQLite tombstone file.
+            ttl_days (float): Days before a missing post is checked again.
+            commit_every (int): Number of updates to batch into one commit.
+        """
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Scrapes run on worker threads, so access is serialised with a lock
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.commit_every = commit_every
+        self._pending_updates = 0
+        self._lock = threading.Lock()
+        self.create_table()
+
+    def create_table(self):
+        """Creates the tombstone table if it doesn't exist."""
+        with self._lock:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS post_tombstones (
+                    channel TEXT NOT NULL,
+                    post_id INTEGER NOT NULL,
+                    first_seen REAL NOT NULL,
+                    last_checked REAL NOT NULL,
+                    PRIMARY KEY (channel, post_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self.conn.commit()
+
+    def _updated(self):
+        self._pending_updates += 1
+        if self._pending_updates >= self.commit_every:
+            self.conn.commit()
+            self._pending_updates = 0
+
+    def commit(self):
+        """Writes all batched updates to disk."""
+        with self._lock:
+            self.conn.commit()
+            self._pending_updates = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def add(self, channel, post_id):
+        """Records that the post is missing, restarting its re-check TTL."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO post_tombstones (channel, post_id, first_seen, last_checked)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (channel, post_id) DO UPDATE
+                SET last_checked = excluded.last_checked
+                """,
+                (channel, post_id, now, now),
+            )
+            self._updated()
+
+    def remove(self, channel, post_id):
+        """Drops the tombstone of a post that turned out to exist."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM post_tombstones WHERE channel = ? AND post_id = ?",
+                (channel, post_id),
+            )
+            if cursor.rowcount:
+                self._updated()
+
+    def is_tombstoned(self, channel, post_id):
+        """Return True if the post is known to be missing and its TTL hasn't expired."""
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT 1 FROM post_tombstones
+                WHERE channel = ? AND post_id = ? AND last_checked > ?
+                """,
+                (channel, post_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return row is not None
+
+    def live_tombstones(self, channel):
+        """Return the set of post numbers of the channel that should not be requested."""
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT post_id FROM post_tombstones
+                WHERE channel = ? AND last_checked > ?
+                """,
+                (channel, time.time() - self.ttl_seconds),
+            )
+            return {row[0] for row in rows}
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Replace this script's folder so data_cleaning resolves to the package, not data_cleaning.py
+sys.path[0] = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+from data_cleaning.imputation import impute_from_neighbours  # noqa: E402
+
+
+def legacy_fill_views(raw_data):
+    """The previous row-by-row implementation of DataCleaning.fill_views_with_average."""
+    raw_data = raw_data.reset_index(drop=True)
+    missing_views_indices = raw_data[raw_data["views"].isna()].index
+    for idx in missing_views_indices:
+        window = raw_data["views"].iloc[max(0, idx - 5) : idx + 5].dropna()
+        if not window.empty:
+            raw_data.at[idx, "views"] = window.mean()
+    return raw_data["views"]
+
+
+def make_posts(rows, channels, missing_ratio, seed=0):
+    """Synthetic posts of several interleaved channels with some 'views' missing."""
+    rng = np.random.default_rng(seed)
+    channel = rng.integers(0, channels, rows)
+    views = rng.lognormal(8, 1, rows)
+    views[rng.random(rows) < missing_ratio] = np.nan
+    return pd.DataFrame(
+        {
+            "channel_username": pd.Series(channel).map(lambda c: f"channel_{c}"),
+            "timestamp": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 10**7, rows), unit="s"),
+            "views": views,
+        }
+    )
+
+
+def time_it(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the legacy and vectorized 'views' imputation."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--missing-ratio", type=float, default=0.1)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--strategy", default="mean")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--legacy-max-rows",
+        type=int,
+        default=100_000,
+        help="Skip the legacy loop above this many rows",
+    )
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        posts = make_posts(rows, args.channels, args.missing_ratio)
+        vectorized = time_it(
+            lambda: impute_from_neighbours(
+                posts, window=args.window, strategy=args.strategy
+            ),
+            args.repeat,
+        )
+        line = f"{rows:>10} rows: vectorized {vectorized * 1000:9.1f} ms"
+        if rows <= args.legacy_max_rows:
+            legacy = time_it(lambda: legacy_fill_views(posts), 1)
+            line += f", legacy {legacy * 1000:9.1f} ms ({legacy / vectorized:.0f}x)"
+        print(line)
@@ -0,0 +1,90 @@
+import argparse
+import ast
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Replace this script's folder so data_cleaning resolves to the package, not data_cleaning.py
+sys.path[0] = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+from data_cleaning.data_cleaning import load_raw_data  # noqa: E402
+
+
+def legacy_load(path):
+    """The previous read_csv plus after-the-fact type repairs of the cleaning steps."""
+    raw_data = pd.read_csv(path)
+    raw_data["views"] = (
+        raw_data["views"]
+        .replace({"K": "e3", "M": "e6"}, regex=True)
+        .apply(pd.to_numeric, errors="coerce")
+        .replace("", np.nan)
+        .astype(float)
+    )
+    raw_data["timestamp"] = pd.to_datetime(raw_data["timestamp"], errors="coerce")
+    for column in ["image_urls", "image_paths"]:
+        raw_data[column] = raw_data[column].apply(
+            lambda x: ast.literal_eval(x) if isinstance(x, str) else []
+        )
+    return raw_data
+
+
+def write_posts(path, rows, channels, seed=0):
+    """Writes a synthetic scraper CSV file."""
+    rng = np.random.default_rng(seed)
+    channel = rng.integers(0, channels, rows)
+    views = rng.integers(1, 999, rows).astype(str)
+    views = np.where(rng.random(rows) < 0.5, np.char.add(views, "K"), views)
+    views = views.astype(object)
+    views[rng.random(rows) < 0.1] = None
+    images = np.where(
+        rng.random(rows) < 0.5,
+        None,
+        "['https://cdn4.telesco.pe/file/a.jpg', 'https://cdn4.telesco.pe/file/b.jpg']",
+    )
+    pd.DataFrame(
+        {
+            "post_id": [f"channel_{c}_{i}" for i, c in enumerate(channel)],
+            "channel_name": [f"Channel {c}" for c in channel],
+            "channel_username": [f"channel_{c}" for c in channel],
+            "author": None,
+            "message_text": "Some post text " * 5,
+            "views": views,
+            "timestamp": (
+                pd.Timestamp("2024-01-01", tz="UTC")
+                + pd.to_timedelta(np.arange(rows), unit="min")
+            ).strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+            "image_urls": images,
+            "image_paths": images,
+            "source": "Telegram",
+        }
+    ).to_csv(path, index=False)
+
+
+def measure(load, path):
+    start = time.perf_counter()
+    data = load(path)
+    return time.perf_counter() - start, data.memory_usage(deep=True).sum() / 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the legacy and typed ingestion of scraped posts."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--channels", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in args.rows:
+            path = os.path.join(folder, f"posts_{rows}.csv")
+            write_posts(path, rows, args.channels)
+            legacy_time, legacy_memory = measure(legacy_load, path)
+            typed_time, typed_memory = measure(load_raw_data, path)
+            print(
+                f"{rows:>10} rows: legacy {legacy_time:6.2f}s {legacy_memory:8.1f} MB, "
+                f"typed {typed_time:6.2f}s {typed_memory:8.1f} MB"
+            )
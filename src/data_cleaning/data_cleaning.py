@@ -1,11 +1,143 @@
 import pandas as pd
-import numpy as np
 import logging
+import os
+from data_cleaning.imputation import impute_from_neighbours
+from data_cleaning.schema import (
+    CATEGORY_COLUMNS,
+    CSV_DTYPES,
+    apply_schema,
+    parse_list_column,
+    parse_timestamps,
+    parse_views,
+)
+
+
+def load_raw_data(path):
+    """
+    Load scraped posts from the scraper's CSV file or Parquet dataset.
+
+    Args:
+        path (str): A CSV file, a Parquet file or a partitioned Parquet folder.
+
+    Returns:
+        DataFrame: The raw posts, typed as described in schema.apply_schema.
+    """
+    if os.path.isdir(path) or path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        # pandas can't restore list<string>[pyarrow] columns from the metadata
+        # of files it wrote itself, and apply_schema sets the types anyway
+        raw_data = pq.read_table(path).to_pandas(ignore_metadata=True)
+        # 'date' is only the partition key derived from 'timestamp'
+        raw_data = raw_data.drop(columns=["date"], errors="ignore")
+        # File order is arbitrary, use the publication order read_raw_chunks yields
+        return _publication_order(apply_schema(raw_data))
+    raw_data = pd.read_csv(path, dtype=CSV_DTYPES)
+    return apply_schema(raw_data)
+
+
+def _publication_order(data):
+    """Sorts typed posts by channel and timestamp, breaking ties by post_id."""
+    keys = [
+        key
+        for key in ("channel_username", "timestamp", "post_id")
+        if key in data.columns
+    ]
+    return data.sort_values(keys, kind="mergesort", ignore_index=True)
+
+
+def _read_parquet_chunks(path, chunksize):
+    """
+    Stream a Parquet dataset in publication order per channel.
+
+    The scraper partitions by channel and day, so partitions are read one at a
+    time in (channel, day) order and sorted by timestamp; memory is bounded by
+    one partition plus one chunk.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    partitions = {}
+    for file in dataset.files:
+        partitions.setdefault(os.path.dirname(file), []).append(file)
+
+    buffered, rows = [], 0
+    for folder in sorted(partitions):
+        partition = ds.dataset(
+            partitions[folder],
+            schema=dataset.schema,
+            format="parquet",
+            partitioning="hive",
+            partition_base_dir=path if os.path.isdir(path) else None,
+        ).to_table()
+        frame = partition.to_pandas(ignore_metadata=True)
+        frame = _publication_order(
+            apply_schema(frame.drop(columns=["date"], errors="ignore"))
+        )
+        buffered.append(frame)
+        rows += len(frame)
+        if rows < chunksize:
+            continue
+        data = pd.concat(buffered, ignore_index=True)
+        for start in range(0, len(data) - chunksize + 1, chunksize):
+            yield apply_schema(
+                data.iloc[start : start + chunksize].reset_index(drop=True)
+            )
+        rest = data.iloc[len(data) - len(data) % chunksize :].reset_index(drop=True)
+        buffered, rows = ([rest] if len(rest) else []), len(rest)
+    if buffered:
+        yield apply_schema(pd.concat(buffered, ignore_index=True))
+
+
+def read_raw_chunks(path, chunksize=50_000):
+    """
+    Stream scraped posts from the scraper's CSV file or Parquet dataset in chunks.
+
+    Args:
+        path (str): A CSV file, a Parquet file or a partitioned Parquet folder.
+        chunksize (int): Maximum number of rows per chunk.
+
+    Yields:
+        DataFrame: Consecutive chunks of typed raw posts, in file order for CSV
+        files and in publication order per channel for Parquet datasets.
+    """
+    if os.path.isdir(path) or path.endswith(".parquet"):
+        yield from _read_parquet_chunks(path, chunksize)
+        return
+
+    # Fixed dtypes, so a chunk without any text doesn't come back as float
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=CSV_DTYPES):
+        yield apply_schema(chunk)
 
 
 class DataCleaning:
-    def __init__(self, raw_data):
+    def __init__(
+        self,
+        raw_data=None,
+        views_window=5,
+        views_strategy="mean",
+        near_duplicates=None,
+        duplicate_mode="collapse",
+    ):
+        """
+        Args:
+            raw_data (DataFrame): The scraped posts; not needed for clean_chunks.
+            views_window (int): Neighbouring posts on each side used to fill
+                missing 'views'.
+            views_strategy (str): How neighbouring 'views' are combined, one of
+                imputation.STRATEGIES.
+            near_duplicates (NearDuplicateIndex): Optional index used to find
+                posts whose 'message_text' nearly duplicates an earlier post.
+            duplicate_mode (str): "collapse" drops near-duplicate posts, "mark"
+                keeps them with the canonical post in 'duplicate_of'.
+        """
+        if duplicate_mode not in ("collapse", "mark"):
+            raise ValueError(f"Unknown duplicate_mode '{duplicate_mode}'")
         self.raw_data = raw_data
+        self.views_window = views_window
+        self.views_strategy = views_strategy
+        self.near_duplicates = near_duplicates
+        self.duplicate_mode = duplicate_mode
 
     def remove_unwanted_rows(self):
         """Remove rows where 'message_text' is empty or starts with 'Channel'."""
@@ -17,62 +149,202 @@ class DataCleaning:
         ]
         return self.raw_data
 
-    def fill_views_with_average(self):
-        """Replace missing 'views' values with the average of five rows above and below."""
-        logging.info("Filling missing 'views' values with average of neighbors...")
-        # Ensure 'views' is numeric (handle cases like '2.0K' by converting them to actual numbers)
-        self.raw_data["views"] = (
-            self.raw_data["views"]
-            .replace({"K": "e3", "M": "e6"}, regex=True)  # Convert K and M suffixes
-            .apply(
-                pd.to_numeric, errors="coerce"
-            )  # Convert to numeric, handling errors
-            .replace("", np.nan)  # Handle empty strings as NaN
-            .astype(float)
+    def remove_near_duplicates(self):
+        """Collapse or mark posts whose 'message_text' nearly duplicates an earlier post."""
+        if self.near_duplicates is None or self.raw_data.empty:
+            return self.raw_data
+        logging.info("Finding near-duplicate posts...")
+        duplicate_of = self.near_duplicates.assign(
+            self.raw_data["post_id"].tolist(), self.raw_data["message_text"].tolist()
         )
+        self.raw_data = self.raw_data.assign(duplicate_of=duplicate_of)
+        if self.duplicate_mode == "collapse":
+            self.raw_data = self.raw_data[self.raw_data["duplicate_of"].isna()].drop(
+                columns=["duplicate_of"]
+            )
+        return self.raw_data
+
+    def parse_views(self):
+        """Convert 'views' values like '2.0K' to integers (no-op on typed data)."""
+        self.raw_data["views"] = parse_views(self.raw_data["views"])
+        return self.raw_data
 
-        # Find indices with missing 'views' values
-        missing_views_indices = self.raw_data[self.raw_data["views"].isna()].index
+    def fill_views_with_average(self):
+        """Replace missing 'views' values with the average of neighbouring posts of the same channel."""
+        logging.info("Filling missing 'views' values with average of neighbors...")
+        self.raw_data = self.parse_views()
 
-        for idx in missing_views_indices:
-            # Get the five rows before and after the current row, ignore NaNs
-            window = self.raw_data["views"].iloc[max(0, idx - 5) : idx + 5].dropna()
-            if not window.empty:
-                # Replace missing 'views' with the mean of the window
-                self.raw_data.at[idx, "views"] = window.mean()
+        # Fill missing 'views' from the posts around them in the same channel,
+        # ordered by publication time
+        self.raw_data["views"] = impute_from_neighbours(
+            self.raw_data,
+            column="views",
+            group_by="channel_username",
+            order_by="timestamp",
+            window=self.views_window,
+            strategy=self.views_strategy,
+        ).pipe(parse_views)
 
         return self.raw_data
 
     def standardize_formats(self):
-        """Standardize data formats like dates and views."""
+        """Standardize data formats like dates and channel names."""
         logging.info("Standardizing formats...")
-        # Example: Convert timestamp to datetime format
+        # Convert timestamp to timezone-aware UTC datetimes
         if "timestamp" in self.raw_data.columns:
-            self.raw_data["timestamp"] = pd.to_datetime(
-                self.raw_data["timestamp"], errors="coerce"
-            )
+            self.raw_data["timestamp"] = parse_timestamps(self.raw_data["timestamp"])
+        for column in CATEGORY_COLUMNS:
+            if column in self.raw_data.columns:
+                self.raw_data[column] = self.raw_data[column].astype("category")
         return self.raw_data
 
     def replace_nan_with_empty_array(self, columns):
-        """Replace NaN values in specified columns with an empty array `[]`."""
+        """Convert the specified list columns to native lists, with NaN as an empty array `[]`."""
         for column in columns:
             if column in self.raw_data.columns:
-                self.raw_data[column] = self.raw_data[column].apply(
-                    lambda x: [] if pd.isna(x) else x
-                )
-
-    def clean_data(self):
-        """Run all data cleaning steps."""
-        self.raw_data = self.remove_unwanted_rows()
-        self.raw_data = self.fill_views_with_average()
-        self.raw_data = self.standardize_formats()
+                self.raw_data[column] = parse_list_column(self.raw_data[column])
 
+    def finalize_columns(self):
+        """Replace missing image lists with empty arrays and drop unused columns."""
         # Replace NaN in 'image_urls' and 'image_paths' with empty arrays
         self.replace_nan_with_empty_array(["image_urls", "image_paths"])
 
         # Drop the 'author' column if it exists
         if "author" in self.raw_data.columns:
             self.raw_data = self.raw_data.drop(columns=["author"])
+        return self.raw_data
+
+    def clean_data(self):
+        """Run all data cleaning steps."""
+        self.raw_data = self.remove_unwanted_rows()
+        self.raw_data = self.remove_near_duplicates()
+        self.raw_data = self.fill_views_with_average()
+        self.raw_data = self.standardize_formats()
+        self.raw_data = self.finalize_columns()
 
         logging.info("Data cleaned successfully.")
         return self.raw_data
+
+    def clean_chunks(self, chunks):
+        """
+        Run all data cleaning steps over a stream of raw chunks.
+
+        Only the current chunk plus, per channel, the last 2 * views_window posts
+        are held in memory, so peak memory is bounded by the chunk size and the
+        number of channels rather than the input size.
+
+        Every chunk is sorted by timestamp, but a channel's posts must not go
+        back in time from one chunk to the next: read_raw_chunks yields
+        Parquet datasets in that order. Under that condition the result matches
+        clean_data. A chunk with posts older than ones already streamed for
+        their channel raises ValueError, because the imputation of those earlier
+        posts can no longer change.
+
+        Args:
+            chunks (iterable): Raw DataFrames, e.g. from read_raw_chunks.
+
+        Yields:
+            DataFrame: Cleaned batches, ready for DataStorage.store_cleaned_data.
+        """
+        window = self.views_window
+        carry = None  # Trailing original rows of each channel, see below
+        total = 0
+        for chunk in chunks:
+            self.raw_data = chunk
+            self.raw_data = self.remove_unwanted_rows()
+            self.raw_data = self.remove_near_duplicates()
+            if self.raw_data.empty:
+                continue
+            self.raw_data = self.parse_views()
+            self.raw_data = self.standardize_formats()
+            self.raw_data = self.finalize_columns()
+            self.raw_data = self.raw_data.assign(_emitted=False)
+            if "timestamp" in self.raw_data.columns:
+                self.raw_data = self.raw_data.sort_values(
+                    "timestamp", kind="mergesort", na_position="last"
+                )
+
+            if carry is not None:
+                self._check_publication_order(carry, self.raw_data)
+                self.raw_data = pd.concat([carry, self.raw_data], ignore_index=True)
+                # Chunks have their own categories, so concat falls back to object
+                self.raw_data = self.standardize_formats()
+            else:
+                self.raw_data = self.raw_data.reset_index(drop=True)
+
+            batch, carry = self._impute_chunk(window, final=False)
+            total += len(batch)
+            if not batch.empty:
+                yield batch
+
+        if carry is not None:
+            self.raw_data = carry
+            batch, _ = self._impute_chunk(window, final=True)
+            total += len(batch)
+            if not batch.empty:
+                yield batch
+
+        self.raw_data = None
+        logging.info(f"Data cleaned successfully ({total} rows streamed).")
+
+    @staticmethod
+    def _check_publication_order(carry, chunk):
+        """Raise if the chunk has posts older than carried posts of the same channel."""
+        if "timestamp" not in chunk.columns:
+            return
+        # Posts without a timestamp are ordered last, as in clean_data
+        latest = pd.Timestamp.max.tz_localize("UTC")
+
+        def by_channel(data):
+            return (
+                data["timestamp"]
+                .fillna(latest)
+                .groupby(data["channel_username"].astype(str), sort=False)
+            )
+
+        last_seen = by_channel(carry).max()
+        first_new = by_channel(chunk).min()
+        channels = first_new.index.intersection(last_seen.index)
+        behind = channels[(first_new[channels] < last_seen[channels]).to_numpy()]
+        if len(behind):
+            raise ValueError(
+                f"Posts of {sorted(behind)} are not in publication order across "
+                "chunks; read a Parquet dataset with read_raw_chunks or use clean_data."
+            )
+
+    def _impute_chunk(self, window, final):
+        """
+        Impute 'views' over the carried rows plus the current chunk.
+
+        The last `window` posts of each channel may still gain right-hand
+        neighbours from the next chunk, so they are held back (unless `final`)
+        together with `window` already emitted posts as their left context.
+
+        Returns:
+            tuple: (cleaned batch to emit, rows to carry into the next chunk)
+        """
+        data = self.raw_data
+        # Row order within a channel is the publication order in streaming mode
+        filled = impute_from_neighbours(
+            data,
+            column="views",
+            group_by="channel_username",
+            order_by=None,
+            window=window,
+            strategy=self.views_strategy,
+        )
+        from_end = data.groupby(
+            "channel_username", sort=False, dropna=False, observed=True
+        ).cumcount(ascending=False)
+        held_back = from_end < window if not final else from_end < 0
+        emit = ~data["_emitted"].to_numpy() & ~held_back.to_numpy()
+
+        batch = (
+            data[emit]
+            .assign(views=parse_views(filled[emit]))
+            .drop(columns=["_emitted"])
+        )
+        # Carry original values, so later imputation sees the same inputs
+        carry = data[(from_end < 2 * window).to_numpy()].copy()
+        carry["_emitted"] = carry["_emitted"] | ~held_back[carry.index]
+        return batch, carry.reset_index(drop=True)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# Rolling aggregations available as imputation strategies
+STRATEGIES = ("mean", "median")
+
+
+def impute_from_neighbours(
+    data,
+    column="views",
+    group_by="channel_username",
+    order_by="timestamp",
+    window=5,
+    strategy="mean",
+):
+    """
+    Fill missing values with an aggregate of their neighbours within the same group.
+
+    Rows are ordered by `order_by` within each `group_by` group, and every missing
+    value is replaced by the `strategy` of the non-missing values among the
+    `window` rows before and after it. Values whose whole window is missing stay
+    missing. Runs a single sort plus one rolling pass, so it scales near-linearly.
+
+    Args:
+        data (DataFrame): The data to impute; `column` must be numeric (nullable
+            integer columns are fine).
+        column (str): The column to fill.
+        group_by (str): Neighbours are only taken from rows with the same value
+            (skipped if the column is absent).
+        order_by (str): Column defining the row order within a group (the current
+            row order is used if the column is absent).
+        window (int): Number of neighbours taken on each side.
+        strategy (str): One of STRATEGIES.
+
+    Returns:
+        Series: The filled float column, aligned with `data`.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+
+    values = data[column].to_numpy(dtype=float, na_value=np.nan)
+    sort_keys = [key for key in (group_by, order_by) if key in data.columns]
+    if sort_keys:
+        # Positional sort, so duplicate or non-contiguous index labels are harmless
+        positions = (
+            data[sort_keys]
+            .reset_index(drop=True)
+            .sort_values(sort_keys, kind="mergesort")
+            .index.to_numpy()
+        )
+    else:
+        positions = np.arange(len(values))
+
+    ordered = pd.Series(values[positions])
+    rolling_kwargs = {"window": 2 * window + 1, "center": True, "min_periods": 1}
+    if group_by in data.columns:
+        groups = data[group_by].to_numpy()[positions]
+        neighbours = ordered.groupby(groups, sort=False, dropna=False).transform(
+            lambda group: getattr(group.rolling(**rolling_kwargs), strategy)()
+        )
+    else:
+        neighbours = getattr(ordered.rolling(**rolling_kwargs), strategy)()
+
+    filled = ordered.fillna(neighbours).to_numpy()
+    result = np.empty_like(filled)
+    result[positions] = filled
+    return pd.Series(result, index=data.index, name=column)
@@ -0,0 +1,270 @@
+import io
+import json
+import logging
+import os
+
+import pandas as pd
+
+from data_cleaning.data_cleaning import DataCleaning, load_raw_data
+from data_cleaning.imputation import impute_from_neighbours
+from data_cleaning.schema import CSV_DTYPES, apply_schema, parse_views
+
+
+class IncrementalCleaning:
+    """
+    Cleans only the posts added to the scraped data since the last run.
+
+    New posts are whatever the scraper appended since the last run: CSV sources
+    are read from the byte offset where the last run stopped, Parquet sources
+    only from the files the last run hadn't read (the scraper's sinks never
+    rewrite a file). Post numbers and dates don't matter, so gap posts the
+    crawler re-fetches later, and re-scraped older posts, are cleaned too. A
+    re-scraped post replaces its earlier version, also in the lookback, and is
+    returned again with its new views and text.
+
+    The state directory keeps the read position of the source and a lookback of
+    every channel's last 2 * views_window raw posts, so neighbour imputation of
+    the new posts sees the same neighbours as a full clean_data run. Posts older
+    than a channel's lookback are imputed from the neighbours at hand.
+
+    Usage:
+        cleaning = IncrementalCleaning("../data/telegram_data.csv")
+        new_rows, changed_views = cleaning.run()
+        storage.store_cleaned_data(new_rows)
+        storage.update_views(changed_views)
+        cleaning.commit()
+    """
+
+    def __init__(
+        self,
+        source,
+        state_dir="../data/cleaning_state",
+        views_window=5,
+        views_strategy="mean",
+        near_duplicates=None,
+        duplicate_mode="collapse",
+    ):
+        """
+        Args:
+            source (str): The scraper's CSV file or Parquet dataset.
+            state_dir (str): Folder holding the read position and the lookback rows.
+            views_window (int): Neighbouring posts on each side used to fill
+                missing 'views'.
+            views_strategy (str): How neighbouring 'views' are combined.
+            near_duplicates (NearDuplicateIndex): Optional near-duplicate index,
+                see DataCleaning.
+            duplicate_mode (str): "collapse" or "mark", see DataCleaning.
+        """
+        self.source = source
+        self.views_window = views_window
+        self.views_strategy = views_strategy
+        self.near_duplicates = near_duplicates
+        self.duplicate_mode = duplicate_mode
+        os.makedirs(state_dir, exist_ok=True)
+        self.watermarks_path = os.path.join(state_dir, "watermarks.json")
+        self.lookback_path = os.path.join(state_dir, "lookback.parquet")
+        self.state = self._load_state()
+        self.lookback = self._load_lookback()
+        self._pending = None
+
+    def _load_state(self):
+        if not os.path.exists(self.watermarks_path):
+            return {"sources": {}}
+        with open(self.watermarks_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load_lookback(self):
+        if not os.path.exists(self.lookback_path):
+            return None
+        lookback = load_raw_data(self.lookback_path)
+        lookback["_emitted_views"] = parse_views(lookback["_emitted_views"])
+        return lookback
+
+    def _is_parquet(self):
+        return os.path.isdir(self.source) or self.source.endswith(".parquet")
+
+    def read_tail(self):
+        """
+        Reads the raw posts added since the last run, typed.
+
+        Returns:
+            tuple: (tail DataFrame, updated source state)
+        """
+        if self._is_parquet():
+            return self._read_parquet_tail()
+        return self._read_csv_tail()
+
+    def _read_csv_tail(self):
+        source_state = self.state["sources"].get(self.source, {})
+        offset = source_state.get("offset", 0)
+        size = os.path.getsize(self.source)
+        if size < offset:
+            logging.warning(f"{self.source} shrank since the last run, re-reading it.")
+            offset = 0
+
+        with open(self.source, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # Leave a row that is still being written for the next run
+        data = data[: data.rfind(b"\n") + 1]
+
+        columns = source_state.get("columns")
+        if not data:
+            tail = pd.DataFrame(columns=columns or [])
+        elif offset == 0:
+            tail = pd.read_csv(io.BytesIO(data), dtype=CSV_DTYPES)
+            columns = list(tail.columns)
+        else:
+            tail = pd.read_csv(
+                io.BytesIO(data), names=columns, header=None, dtype=CSV_DTYPES
+            )
+
+        sources = {self.source: {"offset": offset + len(data), "columns": columns}}
+        return apply_schema(tail), sources
+
+    def _read_parquet_tail(self):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.source, format="parquet", partitioning="hive")
+        read_files = self.state["sources"].get(self.source, {}).get("files", {})
+        files = {path: os.path.getsize(path) for path in dataset.files}
+        # A file whose size changed was rewritten and is read again as a whole
+        new_files = [
+            path for path, size in files.items() if read_files.get(path) != size
+        ]
+
+        if new_files:
+            base_dir = self.source if os.path.isdir(self.source) else None
+            table = ds.dataset(
+                new_files,
+                schema=dataset.schema,
+                format="parquet",
+                partitioning="hive",
+                partition_base_dir=base_dir,
+            ).to_table()
+        else:
+            table = dataset.schema.empty_table()
+        tail = table.to_pandas().drop(columns=["date"], errors="ignore")
+        return apply_schema(tail), {self.source: {"files": files}}
+
+    def run(self):
+        """
+        Cleans the posts added since the last run.
+
+        Posts in the lookback were emitted by earlier runs without all of their
+        right-hand neighbours, so their imputed views may change once the new
+        posts arrive; those are returned separately.
+
+        Returns:
+            tuple: (cleaned new posts, DataFrame of 'post_id' and 'views' of
+            previously emitted posts whose imputed views changed). Call commit()
+            once both are stored.
+        """
+        tail, sources = self.read_tail()
+        if tail.empty:
+            self._pending = (sources, self.lookback)
+            logging.info("No new posts to clean.")
+            return tail, pd.DataFrame(columns=["post_id", "views"])
+
+        cleaner = DataCleaning(
+            tail,
+            near_duplicates=self.near_duplicates,
+            duplicate_mode=self.duplicate_mode,
+        )
+        cleaner.raw_data = cleaner.remove_unwanted_rows()
+        cleaner.raw_data = cleaner.remove_near_duplicates()
+        cleaner.raw_data = cleaner.parse_views()
+        cleaner.raw_data = cleaner.standardize_formats()
+        # The latest scrape of a post wins
+        new = (
+            cleaner.finalize_columns()
+            .drop_duplicates("post_id", keep="last")
+            .assign(_is_new=True)
+        )
+
+        combined = new
+        if self.lookback is not None and new.empty:
+            combined = self.lookback.assign(_is_new=False)
+        elif self.lookback is not None and not self.lookback.empty:
+            new = new.assign(
+                _open=False,
+                _emitted_views=pd.Series(pd.NA, index=new.index, dtype="Int64"),
+            )
+            combined = pd.concat(
+                [self.lookback.assign(_is_new=False), new], ignore_index=True
+            ).drop_duplicates("post_id", keep="last")
+            cleaner.raw_data = combined
+            combined = cleaner.standardize_formats()
+        combined = combined.reset_index(drop=True)
+
+        filled = parse_views(
+            impute_from_neighbours(
+                combined,
+                column="views",
+                group_by="channel_username",
+                order_by="timestamp",
+                window=self.views_window,
+                strategy=self.views_strategy,
+            )
+        )
+        is_new = combined["_is_new"].to_numpy(dtype=bool)
+        helper_columns = ["_is_new", "_open", "_emitted_views"]
+        new_rows = (
+            combined[is_new]
+            .assign(views=filled[is_new])
+            .drop(columns=helper_columns, errors="ignore")
+        )
+
+        changed_views = pd.DataFrame(columns=["post_id", "views"])
+        if "_emitted_views" in combined.columns:
+            # Only open posts can gain neighbours; the others are just context
+            is_open = combined["_open"].eq(True).to_numpy()
+            # Views are never negative, so -1 makes missing values comparable
+            changed = is_open & (
+                filled.fillna(-1) != combined["_emitted_views"].fillna(-1)
+            ).to_numpy(dtype=bool)
+            changed_views = combined.loc[changed, ["post_id"]].assign(
+                views=filled[changed]
+            )
+
+        # Keep the original views as imputation input, plus what was emitted. The
+        # last views_window posts of a channel are open, the ones before them are
+        # their left context.
+        lookback = (
+            combined.assign(_emitted_views=filled)
+            .drop(columns=["_is_new", "_open"], errors="ignore")
+            .sort_values(["channel_username", "timestamp"], kind="mergesort")
+        )
+        from_end = lookback.groupby("channel_username", observed=True).cumcount(
+            ascending=False
+        )
+        lookback = lookback[from_end < 2 * self.views_window].assign(
+            _open=from_end < self.views_window
+        )
+
+        self._pending = (sources, lookback)
+        logging.info(
+            f"Cleaned {len(new_rows)} new posts, {len(changed_views)} earlier posts "
+            "got new views."
+        )
+        return new_rows, changed_views
+
+    def commit(self):
+        """Saves the read position and lookback of the last run; call after storing its output."""
+        if self._pending is None:
+            return
+        sources, lookback = self._pending
+
+        if lookback is not None:
+            temporary_path = f"{self.lookback_path}.tmp"
+            lookback.to_parquet(temporary_path, index=False)
+            os.replace(temporary_path, self.lookback_path)
+            self.lookback = lookback
+
+        # The watermarks file is written last, so it never runs ahead of the lookback
+        self.state["sources"].update(sources)
+        temporary_path = f"{self.watermarks_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temporary_path, self.watermarks_path)
+        self._pending = None
@@ -0,0 +1,282 @@
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+# Mersenne prime used by the MinHash permutations (a * x + b) mod PRIME
+PRIME = (1 << 31) - 1
+
+# Upper bound on shingles hashed at once, keeps the (shingles x num_perm) matrix small
+SHINGLES_PER_BLOCK = 100_000
+
+
+def normalize_text(text):
+    """Lower-cases the text and collapses whitespace, so formatting doesn't matter."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash/LSH index of post texts for near-duplicate detection.
+
+    Every text is reduced to a MinHash signature over its character shingles;
+    signatures are split into bands and each band is hashed into a bucket, so
+    near-duplicates end up sharing a bucket in at least one band with high
+    probability. Only bucket mates are compared, which keeps detection
+    sub-quadratic. Candidates are confirmed when their estimated Jaccard
+    similarity reaches `threshold`.
+
+    Duplicates form clusters around a canonical post: the first post of the
+    cluster the index saw. Only canonical posts are added to the buckets, so
+    large repost clusters don't inflate them. Signatures and buckets are kept in
+    SQLite, so posts are matched against every earlier run.
+    """
+
+    def __init__(
+        self,
+        db_path="../data/near_duplicates.db",
+        num_perm=128,
+        bands=16,
+        threshold=0.8,
+        shingle_size=5,
+        seed=1,
+    ):
+        """
+        Args:
+            db_path (str): Path of the SQLite index file.
+            num_perm (int): Number of MinHash permutations (signature length).
+            bands (int): Number of LSH bands; must divide num_perm. More bands
+                find less similar candidates.
+            threshold (float): Estimated Jaccard similarity from which two
+                texts are near-duplicates.
+            shingle_size (int): Characters per shingle.
+            seed (int): Seed of the permutations.
+        """
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+        self._powers = rng.integers(1, 1 << 61, shingle_size, dtype=np.uint64)
+        self._band_coefficients = rng.integers(
+            1, 1 << 61, num_perm // bands, dtype=np.uint64
+        )
+
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        self._check_parameters(seed)
+
+    def create_tables(self):
+        """Creates the index tables if they don't exist."""
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS index_parameters (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS minhash_signatures (
+                post_id TEXT PRIMARY KEY,
+                canonical_id TEXT NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                post_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS lsh_buckets_key ON lsh_buckets (band, bucket);
+            """
+        )
+        self.conn.commit()
+
+    def _check_parameters(self, seed):
+        """Signatures are only comparable when built with the same parameters."""
+        parameters = {
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "seed": seed,
+        }
+        stored = dict(self.conn.execute("SELECT name, value FROM index_parameters"))
+        if not stored:
+            self.conn.executemany(
+                "INSERT INTO index_parameters (name, value) VALUES (?, ?)",
+                [(name, str(value)) for name, value in parameters.items()],
+            )
+            self.conn.commit()
+            return
+        for name, value in parameters.items():
+            if stored.get(name) != str(value):
+                raise ValueError(
+                    f"Index was built with {name}={stored.get(name)}, not {value}"
+                )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _shingle_hashes(self, text):
+        """Unique hashes of the text's character shingles."""
+        codes = np.frombuffer(
+            normalize_text(text).encode("utf-32-le"), dtype=np.uint32
+        ).astype(np.uint64)
+        if len(codes) < self.shingle_size:
+            codes = np.pad(codes, (0, self.shingle_size - len(codes)))
+        windows = np.lib.stride_tricks.sliding_window_view(codes, self.shingle_size)
+        # Polynomial hash, wrapping mod 2**64, folded into [0, PRIME)
+        hashes = (windows * self._powers).sum(axis=1)
+        return np.unique((hashes ^ (hashes >> np.uint64(32))) % np.uint64(PRIME))
+
+    def signatures(self, texts):
+        """
+        Computes the MinHash signatures of the texts.
+
+        Returns:
+            ndarray: (len(texts), num_perm) uint64 signatures.
+        """
+        shingles = [self._shingle_hashes(text) for text in texts]
+        result = np.empty((len(shingles), self.num_perm), dtype=np.uint64)
+        start = 0
+        while start < len(shingles):
+            # Hash a block of texts at once, bounded by its number of shingles
+            end, size = start, 0
+            while end < len(shingles) and (end == start or size < SHINGLES_PER_BLOCK):
+                size += len(shingles[end])
+                end += 1
+            block = np.concatenate(shingles[start:end])
+            offsets = np.cumsum([0] + [len(s) for s in shingles[start : end - 1]])
+            # (num_perm, shingles) layout, reducing along rows is about twice as fast
+            permuted = (self._a[:, None] * block + self._b[:, None]) % np.uint64(PRIME)
+            result[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return result
+
+    def band_buckets(self, signatures):
+        """
+        Hashes every band of the signatures into a bucket.
+
+        Returns:
+            ndarray: (len(signatures), bands) int64 bucket keys.
+        """
+        rows = self.num_perm // self.bands
+        banded = signatures.reshape(len(signatures), self.bands, rows)
+        return (banded * self._band_coefficients).sum(axis=2).view(np.int64)
+
+    def _temporary_table(self, name, columns, rows):
+        self.conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+        self.conn.execute(f"CREATE TEMP TABLE {name} ({columns})")
+        placeholders = ", ".join("?" * len(columns.split(",")))
+        self.conn.executemany(f"INSERT INTO temp.{name} VALUES ({placeholders})", rows)
+
+    def assign(self, post_ids, texts):
+        """
+        Finds the cluster of every post and adds the new posts to the index.
+
+        Posts already in the index keep their earlier cluster, so re-running on
+        the same data is stable. Posts of the batch are also matched against
+        each other, in order.
+
+        Args:
+            post_ids (list): Unique post ids.
+            texts (list): The posts' message texts.
+
+        Returns:
+            list: For every post, the id of the canonical post it duplicates, or
+            None if the post is canonical itself.
+        """
+        post_ids = [str(post_id) for post_id in post_ids]
+        self._temporary_table("batch_posts", "post_id TEXT", [(p,) for p in post_ids])
+        known = dict(
+            self.conn.execute(
+                """
+                SELECT s.post_id, s.canonical_id FROM minhash_signatures s
+                JOIN temp.batch_posts b ON b.post_id = s.post_id
+                """
+            )
+        )
+
+        new, seen = [], set(known)
+        for row, post_id in enumerate(post_ids):
+            if post_id not in seen:
+                new.append(row)
+                seen.add(post_id)
+        signatures = self.signatures([texts[row] for row in new])
+        buckets = self.band_buckets(signatures)
+
+        # Canonical posts of earlier runs sharing a bucket with a new post
+        self._temporary_table(
+            "batch_buckets",
+            "position INTEGER, band INTEGER, bucket INTEGER",
+            (
+                (position, band, int(buckets[position, band]))
+                for position in range(len(new))
+                for band in range(self.bands)
+            ),
+        )
+        candidates = {}
+        for position, post_id, signature in self.conn.execute(
+            """
+            SELECT DISTINCT k.position, s.post_id, s.signature
+            FROM temp.batch_buckets k
+            JOIN lsh_buckets l ON l.band = k.band AND l.bucket = k.bucket
+            JOIN minhash_signatures s ON s.post_id = l.post_id
+            """
+        ):
+            candidates.setdefault(position, []).append(
+                (post_id, np.frombuffer(signature, dtype=np.uint64))
+            )
+
+        batch_buckets = {}
+        canonical = {}
+        new_signatures, new_buckets = [], []
+        for position, row in enumerate(new):
+            signature = signatures[position]
+            post_candidates = list(candidates.get(position, []))
+            for band in range(self.bands):
+                post_candidates += batch_buckets.get(
+                    (band, buckets[position, band]), []
+                )
+
+            best, best_similarity = None, 0
+            for candidate_id, candidate_signature in post_candidates:
+                similarity = np.mean(signature == candidate_signature)
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best, best_similarity = candidate_id, similarity
+
+            post_id = post_ids[row]
+            canonical[post_id] = best or post_id
+            new_signatures.append((post_id, canonical[post_id], signature.tobytes()))
+            if best is None:
+                for band in range(self.bands):
+                    key = (band, buckets[position, band])
+                    batch_buckets.setdefault(key, []).append((post_id, signature))
+                    new_buckets.append((band, int(key[1]), post_id))
+
+        self.conn.executemany(
+            """
+            INSERT INTO minhash_signatures (post_id, canonical_id, signature)
+            VALUES (?, ?, ?)
+            """,
+            new_signatures,
+        )
+        self.conn.executemany(
+            "INSERT INTO lsh_buckets (band, bucket, post_id) VALUES (?, ?, ?)",
+            new_buckets,
+        )
+        self.conn.commit()
+
+        canonical.update(known)
+        return [
+            canonical[post_id] if canonical[post_id] != post_id else None
+            for post_id in post_ids
+        ]
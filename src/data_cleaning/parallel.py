@@ -0,0 +1,168 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+from data_cleaning.data_cleaning import DataCleaning, load_raw_data
+from data_cleaning.schema import apply_schema
+
+
+def _is_dataset(source):
+    return isinstance(source, str) and os.path.isdir(source)
+
+
+def read_channel_partition(source, channel):
+    """Reads one channel of a partitioned Parquet dataset, skipping the others' files."""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(source, format="parquet", partitioning="hive")
+    table = dataset.to_table(filter=ds.field("channel_username") == channel)
+    raw_data = table.to_pandas().drop(columns=["date"], errors="ignore")
+    return apply_schema(raw_data)
+
+
+def clean_partition(source, channel, output_path, views_window, views_strategy):
+    """
+    Cleans one channel's posts in a worker process.
+
+    Args:
+        source (str): A Parquet file holding only the channel's posts, or the
+            partitioned Parquet dataset the channel is read from.
+        channel (str): The channel username.
+        output_path (str): Parquet file the cleaned posts are written to.
+
+    Returns:
+        tuple: (channel, output_path, number of cleaned rows)
+    """
+    if _is_dataset(source):
+        raw_data = read_channel_partition(source, channel)
+    else:
+        raw_data = load_raw_data(source)
+
+    cleaned = DataCleaning(
+        raw_data, views_window=views_window, views_strategy=views_strategy
+    ).clean_data()
+    cleaned.to_parquet(output_path, index=False)
+    return channel, output_path, len(cleaned)
+
+
+def _read_cleaned(paths):
+    """Concatenates cleaned partitions in the given order, typed."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.concat_tables(
+        [pq.read_table(path) for path in paths], promote_options="default"
+    )
+    # Metadata is ignored for the same reason as in load_raw_data
+    return apply_schema(table.to_pandas(ignore_metadata=True))
+
+
+def _remove_near_duplicates(cleaned, near_duplicates, duplicate_mode):
+    """Runs the near-duplicate pass over the merged channels in publication order."""
+    cleaner = DataCleaning(
+        cleaned.sort_values(["timestamp", "post_id"], kind="mergesort"),
+        near_duplicates=near_duplicates,
+        duplicate_mode=duplicate_mode,
+    )
+    # Back to channel order; the merged index is still a RangeIndex
+    return cleaner.remove_near_duplicates().sort_index().reset_index(drop=True)
+
+
+def clean_in_parallel(
+    source,
+    workers=None,
+    views_window=5,
+    views_strategy="mean",
+    work_dir=None,
+    near_duplicates=None,
+    duplicate_mode="collapse",
+):
+    """
+    Runs the DataCleaning steps for every channel in a separate process.
+
+    Channels are independent once imputation is grouped by channel, so each
+    channel is cleaned on its own. Partitions travel between processes as Parquet
+    files rather than pickled DataFrames: a partitioned Parquet dataset is read
+    by the workers directly (only their channel's files), other inputs are split
+    into one Parquet file per channel first. The largest channels are started
+    first; results are merged in channel order, so the output doesn't depend on
+    which worker finishes first.
+
+    Near-duplicates can span channels, so they are found after the merge, in one
+    pass over all posts in publication order (the earliest post is canonical).
+    Unlike clean_data, collapsed duplicates were still used as neighbours when
+    imputing views.
+
+    Args:
+        source (str or DataFrame): The scraper's CSV file, Parquet file or
+            partitioned Parquet dataset, or already loaded raw posts.
+        workers (int): Number of worker processes (defaults to the CPU count).
+        views_window (int): Neighbouring posts on each side used to fill
+            missing 'views'.
+        views_strategy (str): How neighbouring 'views' are combined.
+        work_dir (str): Folder for the intermediate files (a temporary folder
+            by default, removed afterwards).
+        near_duplicates (NearDuplicateIndex): Optional near-duplicate index,
+            see DataCleaning.
+        duplicate_mode (str): "collapse" or "mark", see DataCleaning.
+
+    Returns:
+        DataFrame: The cleaned posts, ordered by channel.
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=work_dir) as folder:
+        tasks = []
+        if _is_dataset(source):
+            import pyarrow.dataset as ds
+
+            dataset = ds.dataset(source, format="parquet", partitioning="hive")
+            sizes = (
+                dataset.to_table(columns=["channel_username"])
+                .to_pandas()["channel_username"]
+                .value_counts()
+            )
+            for channel, size in sizes.items():
+                tasks.append((size, source, str(channel)))
+        else:
+            raw_data = load_raw_data(source) if isinstance(source, str) else source
+            groups = raw_data.groupby(
+                raw_data["channel_username"].astype(str), sort=False, dropna=False
+            )
+            for number, (channel, partition) in enumerate(groups):
+                path = os.path.join(folder, f"raw-{number:05d}.parquet")
+                partition.to_parquet(path, index=False)
+                tasks.append((len(partition), path, channel))
+            del raw_data, groups
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    clean_partition,
+                    path,
+                    channel,
+                    os.path.join(folder, f"cleaned-{number:05d}.parquet"),
+                    views_window,
+                    views_strategy,
+                )
+                for number, (_, path, channel) in enumerate(
+                    sorted(tasks, key=lambda task: -task[0])
+                )
+            ]
+            for future in futures:
+                channel, output_path, rows = future.result()
+                results[channel] = output_path
+
+        cleaned = _read_cleaned([results[channel] for channel in sorted(results)])
+
+    if near_duplicates is not None:
+        cleaned = _remove_near_duplicates(cleaned, near_duplicates, duplicate_mode)
+
+    logging.info(
+        f"Cleaned {len(cleaned)} rows of {len(results)} channels with "
+        f"{workers or os.cpu_count()} workers in {time.perf_counter() - start:.1f}s."
+    )
+    return cleaned
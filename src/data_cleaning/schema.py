@@ -0,0 +1,109 @@
+import pandas as pd
+
+# Multipliers of the suffixes Telegram uses in view counters, e.g. '2.1K'
+VIEWS_SUFFIXES = {"": 1, "K": 10**3, "M": 10**6, "B": 10**9}
+
+# Low-cardinality text columns, stored as categoricals
+CATEGORY_COLUMNS = ("channel_name", "channel_username", "source")
+
+# Columns holding lists of strings; CSV files store them as Python list literals
+LIST_COLUMNS = ("image_urls", "image_paths")
+
+# Types read_csv applies while parsing; the rest is converted by apply_schema
+CSV_DTYPES = {
+    "post_id": str,
+    "author": str,
+    "message_text": str,
+    "views": str,
+    "timestamp": str,
+    **{column: "category" for column in CATEGORY_COLUMNS},
+}
+
+
+def parse_views(values):
+    """
+    Convert view counters like '845', '2.1K' or '1.3M' to integers.
+
+    Args:
+        values (Series): Raw view counters; numbers are passed through.
+
+    Returns:
+        Series: Nullable Int64 views, missing where the counter can't be parsed.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.round().astype("Int64")
+
+    parts = (
+        values.astype("string")
+        .str.strip()
+        .str.upper()
+        .str.extract(r"^([0-9]*\.?[0-9]+)([KMB]?)$")
+    )
+    numbers = pd.to_numeric(parts[0], errors="coerce")
+    multipliers = parts[1].map(VIEWS_SUFFIXES).astype(float)
+    return (numbers * multipliers).round().astype("Int64")
+
+
+def parse_timestamps(values):
+    """Convert ISO 8601 timestamps to timezone-aware UTC datetimes."""
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert("UTC")
+    return pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+
+
+def parse_list_column(values):
+    """
+    Convert a column of string lists to a native Arrow list column.
+
+    CSV cells like "['a.jpg', 'b.jpg']" are split with vectorised Arrow string
+    kernels rather than evaluated one by one; items are URLs and file paths,
+    which never contain quotes. Missing values become empty lists.
+
+    Returns:
+        Series: A list<string>[pyarrow] column.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    list_type = pa.list_(pa.string())
+    present = values.dropna()
+    if present.empty:
+        # All missing, possibly read as a float column
+        lists = pa.nulls(len(values), type=list_type)
+    elif isinstance(present.iloc[0], str):
+        text = pa.array(values, type=pa.string(), from_pandas=True)
+        # "['a', 'b']" -> "a', 'b" -> ["a", "b"]
+        inner = pc.replace_substring_regex(text, r"^\s*\[\s*'?|'?\s*\]\s*$", "")
+        inner = pc.if_else(pc.equal(inner, ""), pa.scalar(None, pa.string()), inner)
+        lists = pc.split_pattern(inner, "', '")
+    else:
+        # Parquet list columns, as Arrow lists or numpy arrays
+        lists = pa.array(values, type=list_type, from_pandas=True)
+
+    lists = pc.fill_null(lists, pa.scalar([], type=list_type))
+    return pd.Series(pd.arrays.ArrowExtensionArray(lists), index=values.index)
+
+
+def apply_schema(data):
+    """
+    Convert raw scraped posts to the typed ingestion schema, in place.
+
+    - views: nullable Int64
+    - timestamp: datetime64[ns, UTC]
+    - channel_name, channel_username, source: category
+    - image_urls, image_paths: list<string>[pyarrow]
+
+    Returns:
+        DataFrame: The typed data.
+    """
+    if "views" in data.columns:
+        data["views"] = parse_views(data["views"])
+    if "timestamp" in data.columns:
+        data["timestamp"] = parse_timestamps(data["timestamp"])
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns and data[column].dtype != "category":
+            data[column] = data[column].astype("category")
+    for column in LIST_COLUMNS:
+        if column in data.columns:
+            data[column] = parse_list_column(data[column])
+    return data
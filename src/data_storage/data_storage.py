@@ -1,6 +1,55 @@
 import logging
 import ast  # Import ast to safely evaluate string representations of lists
+import io
+import time
 import numpy as np
+import pandas as pd
+
+# Columns of the cleaned_data table, in COPY order
+CLEANED_DATA_COLUMNS = (
+    "post_id",
+    "channel_name",
+    "channel_username",
+    "message_text",
+    "views",
+    "timestamp",
+    "image_urls",
+    "image_paths",
+    "source",
+    "duplicate_of",
+)
+
+# NULL marker of the COPY CSV input, so empty strings stay empty strings
+COPY_NULL = "\\N"
+
+# Per-session staging table of merge loads; temporary tables are unlogged and
+# private to the session, so concurrent loaders don't see each other's rows
+CREATE_STAGING_QUERY = """
+CREATE TEMP TABLE IF NOT EXISTS cleaned_data_staging
+(LIKE cleaned_data INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+
+# Upserts the staged rows, only touching rows whose content hash changed.
+# RETURNING only reports inserted and updated rows; xmax is 0 for inserted ones.
+MERGE_QUERY = f"""
+INSERT INTO cleaned_data ({", ".join(CLEANED_DATA_COLUMNS)}, content_hash)
+SELECT {", ".join(CLEANED_DATA_COLUMNS)},
+       md5(ROW({", ".join(CLEANED_DATA_COLUMNS)})::text)
+FROM cleaned_data_staging
+ON CONFLICT (post_id) DO UPDATE SET
+    {", ".join(f"{column} = EXCLUDED.{column}" for column in CLEANED_DATA_COLUMNS[1:])},
+    content_hash = EXCLUDED.content_hash
+WHERE cleaned_data.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+RETURNING (xmax = 0) AS inserted
+"""
+
+
+def _quote_array_item(item):
+    """Quote one element of a PostgreSQL array literal."""
+    if item is None:
+        return "NULL"
+    item = str(item).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{item}"'
 
 
 class DataStorage:
@@ -20,9 +69,12 @@ class DataStorage:
             timestamp TIMESTAMP,
             image_urls TEXT[],
             image_paths TEXT[],
-            source VARCHAR 
-            
+            source VARCHAR ,
+            duplicate_of VARCHAR,  -- canonical post of a near-duplicate ("mark" mode)
+            content_hash CHAR(32)  -- md5 of the other columns, see MERGE_QUERY
         );
+        ALTER TABLE cleaned_data ADD COLUMN IF NOT EXISTS duplicate_of VARCHAR;
+        ALTER TABLE cleaned_data ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
         """
         try:
             cursor = self.db_conn.get_cursor()
@@ -37,77 +89,230 @@ class DataStorage:
 
     def convert_list_to_pg_array(self, lst):
         """Convert a Python list to PostgreSQL array format."""
-        if isinstance(lst, list):
-            return "{" + ",".join(f'"{item}"' for item in lst) + "}"
-        return lst  # Return as-is if it's not a list
+        # String lists come from raw CSV input, arrays from native list columns
+        if isinstance(lst, str):
+            lst = ast.literal_eval(lst)
+        if isinstance(lst, (list, tuple, np.ndarray)):
+            return "{" + ",".join(_quote_array_item(item) for item in lst) + "}"
+        return "{}"  # Missing lists are stored as empty arrays
+
+    def _copy_buffer(self, batch):
+        """Encode a batch of cleaned rows as CSV for COPY ... FROM STDIN."""
+        views = pd.to_numeric(batch["views"], errors="coerce").astype(float)
+        # Missing and out-of-range views are stored as 0
+        views = views.where(views.abs() < 2**63, 0).fillna(0).round().astype("int64")
+
+        timestamps = pd.to_datetime(batch["timestamp"], errors="coerce", utc=True)
+        rows = pd.DataFrame(
+            {
+                "post_id": batch["post_id"].astype(str),
+                "channel_name": batch["channel_name"].astype(object),
+                "channel_username": batch["channel_username"].astype(object),
+                "message_text": batch["message_text"].astype(object),
+                "views": views.to_numpy(),
+                # cleaned_data.timestamp has no time zone, values are stored in UTC
+                "timestamp": timestamps.dt.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "image_urls": [
+                    self.convert_list_to_pg_array(items)
+                    for items in batch["image_urls"]
+                ],
+                "image_paths": [
+                    self.convert_list_to_pg_array(items)
+                    for items in batch["image_paths"]
+                ],
+                "source": batch["source"].astype(object),
+                # Only set when near-duplicates were marked rather than collapsed
+                "duplicate_of": (
+                    batch["duplicate_of"].astype(object)
+                    if "duplicate_of" in batch.columns
+                    else None
+                ),
+            }
+        )
+        buffer = io.StringIO()
+        rows.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+        buffer.seek(0)
+        return buffer
+
+    def _copy_query(self, table):
+        return (
+            f"COPY {table} ({', '.join(CLEANED_DATA_COLUMNS)}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        )
+
+    def bulk_load(self, cleaned_data, batch_size=50_000, table="cleaned_data"):
+        """
+        Stream cleaned data into PostgreSQL with COPY ... FROM STDIN.
+
+        Every batch is encoded as CSV in memory and copied in its own transaction;
+        a failing batch is rolled back and the error raised, earlier batches stay
+        committed.
 
-    def store_cleaned_data(self, cleaned_data):
-        """Store cleaned data into PostgreSQL."""
+        Args:
+            cleaned_data (DataFrame): The cleaned posts.
+            batch_size (int): Rows per COPY and transaction.
+            table (str): The table to load into.
+
+        Returns:
+            dict: Loaded rows, elapsed seconds and rows per second.
+        """
+        copy_query = self._copy_query(table)
+        start = time.perf_counter()
+        loaded = 0
+        cursor = self.db_conn.get_cursor()
         try:
-            cursor = self.db_conn.get_cursor()
-            # Iterate through each row in the cleaned data
-            for index, row in cleaned_data.iterrows():
-
-                views_value = int(row["views"]) if not np.isnan(row["views"]) else 0
-
-                # Optionally, add a check for extreme values
-                if (
-                    views_value < -9223372036854775808
-                    or views_value > 9223372036854775807
-                ):
-                    logging.warning(
-                        f"views_value {views_value} is out of range for BIGINT, setting to 0."
+            for offset in range(0, len(cleaned_data), batch_size):
+                batch = cleaned_data.iloc[offset : offset + batch_size]
+                try:
+                    cursor.copy_expert(copy_query, self._copy_buffer(batch))
+                    self.db_conn.commit()
+                except Exception as e:
+                    logging.error(
+                        f"Error copying rows {offset}-{offset + len(batch)} into {table}: {e}"
                     )
-                    views_value = 0
-
-                # Convert string representations of lists to actual lists
-                image_urls_list = (
-                    ast.literal_eval(row["image_urls"])
-                    if isinstance(row["image_urls"], str)
-                    else row["image_urls"]
-                )
-                image_paths_list = (
-                    ast.literal_eval(row["image_paths"])
-                    if isinstance(row["image_paths"], str)
-                    else row["image_paths"]
-                )
-
-                # Convert specific columns to PostgreSQL array format
-                image_urls_pg = self.convert_list_to_pg_array(image_urls_list)
-                image_paths_pg = self.convert_list_to_pg_array(image_paths_list)
-
-                # Construct the SQL query to insert data
-                insert_query = """
-                INSERT INTO cleaned_data (post_id, channel_name, channel_username, message_text, views, timestamp, image_urls, image_paths, source)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-
-                # Log the values being inserted for debugging
-                logging.info(
-                    f"Inserting data: post_id={row['post_id']}, message_text={row['message_text']}, views={row['views']}, "
-                    f"timestamp={row['timestamp']}, image_urls={image_urls_pg}, image_paths={image_paths_pg}"
-                )
-
-                # Execute the insert command
-                cursor.execute(
-                    insert_query,
-                    (
-                        row["post_id"],
-                        row["channel_name"],
-                        row["channel_username"],
-                        row["message_text"],
-                        views_value,
-                        row["timestamp"],
-                        image_urls_pg,
-                        image_paths_pg,
-                        row["source"],
-                    ),
-                )
+                    self.db_conn.rollback()
+                    raise
+                loaded += len(batch)
+                logging.debug(f"Copied {loaded}/{len(cleaned_data)} rows into {table}.")
+        finally:
+            cursor.close()
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": loaded,
+            "seconds": elapsed,
+            "rows_per_second": loaded / elapsed if elapsed else 0.0,
+        }
+        logging.info(
+            f"Loaded {loaded} rows into {table} in {elapsed:.1f}s "
+            f"({stats['rows_per_second']:.0f} rows/s)."
+        )
+        return stats
 
+    def merge_load(self, cleaned_data, batch_size=50_000):
+        """
+        Idempotently upsert cleaned data into cleaned_data through a staging table.
+
+        Every batch is copied into the session's unlogged staging table and merged
+        with INSERT ... ON CONFLICT (post_id) DO UPDATE in one transaction. Rows
+        are only rewritten when their content hash changed (e.g. new view
+        counts), so reloading unchanged data costs a scan, not a rewrite. When a
+        post_id occurs more than once, its last row wins.
+
+        Args:
+            cleaned_data (DataFrame): The cleaned posts.
+            batch_size (int): Rows per COPY and transaction.
+
+        Returns:
+            dict: Inserted, updated and unchanged rows, elapsed seconds and rows
+            per second.
+        """
+        cleaned_data = cleaned_data.drop_duplicates("post_id", keep="last")
+        copy_query = self._copy_query("cleaned_data_staging")
+        start = time.perf_counter()
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        cursor = self.db_conn.get_cursor()
+        try:
+            for offset in range(0, len(cleaned_data), batch_size):
+                batch = cleaned_data.iloc[offset : offset + batch_size]
+                try:
+                    cursor.execute(CREATE_STAGING_QUERY)
+                    cursor.copy_expert(copy_query, self._copy_buffer(batch))
+                    cursor.execute(MERGE_QUERY)
+                    changed = [inserted for (inserted,) in cursor.fetchall()]
+                    self.db_conn.commit()
+                except Exception as e:
+                    logging.error(
+                        f"Error merging rows {offset}-{offset + len(batch)} into cleaned_data: {e}"
+                    )
+                    self.db_conn.rollback()
+                    raise
+                inserted = sum(changed)
+                counts["inserted"] += inserted
+                counts["updated"] += len(changed) - inserted
+                counts["unchanged"] += len(batch) - len(changed)
+        finally:
+            cursor.close()
+
+        elapsed = time.perf_counter() - start
+        rows = len(cleaned_data)
+        stats = {
+            **counts,
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed else 0.0,
+        }
+        logging.info(
+            f"Merged {rows} rows into cleaned_data in {elapsed:.1f}s "
+            f"({stats['rows_per_second']:.0f} rows/s): {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged."
+        )
+        return stats
+
+    def store_cleaned_data(self, cleaned_data, batch_size=50_000, mode="merge"):
+        """
+        Store cleaned data into PostgreSQL.
+
+        Args:
+            cleaned_data (DataFrame): The cleaned posts.
+            batch_size (int): Rows per batch.
+            mode (str): "merge" upserts, so reloads are safe (see merge_load);
+                "copy" appends with plain COPY and fails on existing post_ids,
+                but skips the staging step (see bulk_load).
+
+        Returns:
+            dict: The load statistics.
+        """
+        if mode == "merge":
+            return self.merge_load(cleaned_data, batch_size=batch_size)
+        if mode == "copy":
+            return self.bulk_load(cleaned_data, batch_size=batch_size)
+        raise ValueError(f"Unknown load mode '{mode}'")
+
+    def store_cleaned_batches(self, batches):
+        """
+        Store a stream of cleaned batches, e.g. from DataCleaning.clean_chunks.
+
+        Each batch is written and committed on its own, so only one batch is held
+        in memory at a time.
+
+        Returns:
+            int: The number of rows passed to the database.
+        """
+        total = 0
+        for batch in batches:
+            self.store_cleaned_data(batch)
+            total += len(batch)
+        logging.info(f"Stored {total} cleaned rows in batches.")
+        return total
+
+    def update_views(self, changed_views):
+        """
+        Update the views of already stored posts, e.g. the re-imputed ones
+        returned by IncrementalCleaning.run.
+
+        Args:
+            changed_views (DataFrame): 'post_id' and 'views' columns.
+        """
+        if changed_views.empty:
+            return
+        try:
+            cursor = self.db_conn.get_cursor()
+            cursor.executemany(
+                # The stale content hash is cleared, so the next merge re-hashes
+                "UPDATE cleaned_data SET views = %s, content_hash = NULL "
+                "WHERE post_id = %s",
+                [
+                    (int(views) if not pd.isna(views) else 0, post_id)
+                    for post_id, views in zip(
+                        changed_views["post_id"], changed_views["views"]
+                    )
+                ],
+            )
             self.db_conn.commit()
-            logging.info("Cleaned data inserted successfully.")
+            logging.info(f"Updated views of {len(changed_views)} posts.")
         except Exception as e:
-            logging.error(f"Error inserting cleaned data: {e}")
+            logging.error(f"Error updating views: {e}")
             self.db_conn.rollback()
         finally:
             cursor.close()
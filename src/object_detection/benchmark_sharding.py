@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+# Replace this script's folder so object_detection resolves to the package
+sys.path[0] = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+from object_detection.sharded import ShardedDetector  # noqa: E402
+
+
+class CountingHandler:
+    """Stands in for DatabaseHandler, so only detection is measured."""
+
+    def store_detections(self, detections):
+        return {"stored": sum(1 for _ in detections), "failed": 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure images per second of sharded CPU detection."
+    )
+    parser.add_argument("--images", default="../data/tg_image")
+    parser.add_argument("--model", default="yolov5s")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--shard-size", type=int, default=32)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        for threads in args.threads:
+            if workers * threads > os.cpu_count():
+                continue
+            stats = ShardedDetector(
+                args.model,
+                workers=workers,
+                threads_per_worker=threads,
+                batch_size=args.batch_size,
+                shard_size=args.shard_size,
+            ).process_image_folder(args.images, CountingHandler())
+            print(
+                f"{workers:>3} workers x {threads:>2} threads: "
+                f"{stats['images_per_second']:7.1f} images/s "
+                f"({stats['images']} images, {stats['stored']} detections, "
+                f"{stats['load_seconds']:.1f}s to start the workers)"
+            )
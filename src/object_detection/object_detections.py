@@ -15,28 +15,45 @@ logging.basicConfig(
 class YOLODetector:
     """Class to handle YOLOv5 object detection."""
 
-    def __init__(self, model_name="yolov5s"):
-        """Initializes the YOLO object detector with the specified model."""
+    def __init__(self, model_name="yolov5s", batch_size=16):
+        """
+        Initializes the YOLO object detector with the specified model.
+
+        Args:
+            model_name (str): The YOLOv5 model to load from torch hub.
+            batch_size (int): Images passed to the model per inference call.
+        """
+        self.model_name = model_name
         self.model = self.load_model(model_name)
+        self.batch_size = batch_size
 
     def load_model(self, model_name):
         """Load the YOLOv5 model from torch hub."""
         logging.info(f"Loading YOLOv5 model: {model_name}")
         return torch.hub.load("ultralytics/yolov5", model_name)
 
-    def detect_objects_in_image(self, image_path, save_path=None):
-        """Detect objects in a single image and save the annotated image."""
-        img = cv2.imread(image_path)
-        results = self.model(img)
+    def annotate_image(self, img, image_name, predictions, save_path=None):
+        """
+        Draws the predicted boxes on an image and saves it.
+
+        Args:
+            img (ndarray): The image, drawn on in place.
+            image_name (str): File name of the image.
+            predictions (Tensor): The image's rows of results.xyxy.
+            save_path (str): Folder the annotated image is saved to, if given.
+
+        Returns:
+            list: The image's detection dicts.
+        """
         detections = []
 
         # Process detections and draw bounding boxes
-        for detection in results.xyxy[0]:
+        for detection in predictions:
             xmin, ymin, xmax, ymax, confidence, class_id = detection[:6]
             class_name = self.model.names[int(class_id)]
             detections.append(
                 {
-                    "image_name": os.path.basename(image_path),
+                    "image_name": image_name,
                     "class_name": class_name,
                     "confidence": confidence.item(),
                     "x_min": xmin.item(),
@@ -45,6 +62,7 @@ class YOLODetector:
                     "y_max": ymax.item(),
                     "detection_time": datetime.now(),
                     "save_path": save_path,  # Include save_path in the detection entry
+                    "model_name": self.model_name,
                 }
             )
             # Draw bounding box
@@ -63,39 +81,161 @@ class YOLODetector:
                 2,
             )
             logging.info(
-                f"Detected {class_name} with confidence {confidence:.2f} in {os.path.basename(image_path)}"
+                f"Detected {class_name} with confidence {confidence:.2f} in {image_name}"
             )
 
         # Save the image with bounding boxes if a save path is provided
         if save_path:
             # Ensure save directory exists
             os.makedirs(save_path, exist_ok=True)
-            saved_image_path = os.path.join(save_path, os.path.basename(image_path))
+            saved_image_path = os.path.join(save_path, image_name)
             cv2.imwrite(saved_image_path, img)
             logging.info(f"Saved image with detections to {saved_image_path}")
 
         return detections
 
-    def process_image_folder(self, image_folder, db_handler, save_path=None):
-        """Processes all images in the given folder and performs object detection."""
-        all_detections = []
-        for image_file in os.listdir(image_folder):
-            if image_file.endswith((".jpg", ".png")):
-                image_path = os.path.join(image_folder, image_file)
-                logging.info(f"Processing image: {image_path}")
-                detections = self.detect_objects_in_image(image_path, save_path)
-                all_detections.extend(detections)
-
-        if all_detections:
-            db_handler.store_detections(all_detections)
+    def detect_objects_in_image(self, image_path, save_path=None):
+        """Detect objects in a single image and save the annotated image."""
+        return self.detect_objects_in_images([image_path], save_path)[0]
+
+    def detect_objects_in_images(self, images, save_path=None, image_names=None):
+        """
+        Detects objects in several images, running the model on batches of them.
+
+        One model call per batch amortises the per-call overhead and lets the
+        model process the images together; results.xyxy[i] holds the boxes of
+        the batch's i-th image.
+
+        Args:
+            images (list): Image paths or BGR image arrays.
+            save_path (str): Folder the annotated images are saved to, if given.
+            image_names (list): File names of the images; defaults to the base
+                names of the paths and to 'image_<n>.jpg' for arrays.
+
+        Returns:
+            list: A list of detection dicts for every image, in input order.
+                Images that can't be read get an empty list.
+        """
+        detections = []
+        for start in range(0, len(images), self.batch_size):
+            batch, names, positions = [], [], []
+            for number in range(start, min(start + self.batch_size, len(images))):
+                image = images[number]
+                if image_names is not None:
+                    name = image_names[number]
+                elif isinstance(image, str):
+                    name = os.path.basename(image)
+                else:
+                    name = f"image_{number}.jpg"
+
+                img = cv2.imread(image) if isinstance(image, str) else image
+                detections.append([])
+                if img is None:
+                    logging.warning(f"Couldn't read image: {image}")
+                    continue
+                batch.append(img)
+                names.append(name)
+                positions.append(number)
+
+            if not batch:
+                continue
+            results = self.model(batch)
+            for i, (img, name, number) in enumerate(zip(batch, names, positions)):
+                detections[number] = self.annotate_image(
+                    img, name, results.xyxy[i], save_path
+                )
+        return detections
+
+    def list_images(self, image_folder):
+        """Paths of the JPEG and PNG images in the folder."""
+        return [
+            os.path.join(image_folder, image_file)
+            for image_file in os.listdir(image_folder)
+            if image_file.endswith((".jpg", ".png"))
+        ]
+
+    def iter_detections(self, image_folder, save_path=None):
+        """Yields the detections of every image in the folder, one batch of images at a time."""
+        return self._iter_detections(self.list_images(image_folder), save_path)
+
+    def _iter_detections(self, image_paths, save_path=None):
+        for start in range(0, len(image_paths), self.batch_size):
+            batch = image_paths[start : start + self.batch_size]
+            logging.info(f"Processing {len(batch)} images from {batch[0]}")
+            for detections in self.detect_objects_in_images(batch, save_path):
+                yield from detections
+
+    def store_images(
+        self, image_paths, db_handler, save_path=None, pipelined=False, replace=False
+    ):
+        """
+        Detects objects in the images and stores the detections, returning the stats.
+
+        With `replace`, the model's earlier detections of these images are
+        replaced instead of added to, see DatabaseHandler.replace_detections.
+        """
+        if pipelined:
+            from object_detection.pipeline import DetectionPipeline
+
+            return DetectionPipeline(self).run(
+                image_paths, db_handler, save_path, replace
+            )
+        detections = self._iter_detections(image_paths, save_path)
+        if replace:
+            return db_handler.replace_detections(
+                [os.path.basename(path) for path in image_paths],
+                self.model_name,
+                detections,
+            )
+        # Detections are streamed to the database in batches as images are processed
+        return db_handler.store_detections(detections)
+
+    def process_image_folder(
+        self, image_folder, db_handler, save_path=None, pipelined=False, registry=None
+    ):
+        """
+        Processes all images in the given folder and performs object detection.
+
+        With `pipelined`, decoding, inference, annotation and storage run as
+        concurrent stages, see DetectionPipeline. Only images this model hasn't
+        processed yet, or that changed since, are detected, and their earlier
+        detections replaced. They are tracked in `registry`, by default the
+        ImageRegistry next to the image folder (see ImageRegistry.for_folder);
+        with `registry=False` every image is detected and its detections added.
+        """
+        image_paths = self.list_images(image_folder)
+        if registry is False:
+            stats = self.store_images(image_paths, db_handler, save_path, pipelined)
         else:
+            from object_detection.registry import ImageRegistry
+
+            opened_here = registry is None
+            if opened_here:
+                registry = ImageRegistry.for_folder(image_folder)
+            try:
+                stats = registry.process(
+                    image_paths,
+                    self.model_name,
+                    # Pending images may have been processed before, replace their rows
+                    lambda paths: self.store_images(
+                        paths, db_handler, save_path, pipelined, replace=True
+                    ),
+                )
+            finally:
+                if opened_here:
+                    registry.close()
+        if not stats["stored"] and not stats["failed"]:
             logging.info("No detections to store.")
 
-    def run(self, image_folder, db_handler, save_path=None):
+    def run(
+        self, image_folder, db_handler, save_path=None, pipelined=False, registry=None
+    ):
         """Run the object detection on the specified image folder and store results using db_handler."""
         try:
             logging.info("Starting object detection...")
-            self.process_image_folder(image_folder, db_handler, save_path)
+            self.process_image_folder(
+                image_folder, db_handler, save_path, pipelined, registry
+            )
             logging.info("Object detection completed.")
         except Exception as e:
             logging.error(f"An error occurred during object detection: {e}")
@@ -0,0 +1,235 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+# Marks the end of a stage's output on a queue
+_STOP = object()
+
+
+class DetectionPipeline:
+    """
+    Runs object detection as concurrent stages connected by bounded queues.
+
+    - decode: a pool of threads reading and decoding images ahead of inference
+    - inference: batches of decoded images run through the model
+    - annotate: a pool of threads drawing the boxes and writing the images
+    - store: one thread streaming the detections to the database
+
+    Image decoding and encoding release the GIL in OpenCV, so disk I/O and JPEG
+    work overlap with inference instead of alternating with it. Bounded queues
+    keep a slow stage from piling up decoded images in memory. Time spent
+    working (not waiting on queues) is recorded per stage, so the bottleneck is
+    the stage with the most busy time.
+    """
+
+    def __init__(self, detector, decode_workers=4, write_workers=2, queue_size=64):
+        """
+        Args:
+            detector (YOLODetector): The detector whose model and annotation are used.
+            decode_workers (int): Threads decoding images.
+            write_workers (int): Threads annotating and writing images.
+            queue_size (int): Maximum number of items waiting between two stages.
+        """
+        self.detector = detector
+        self.decode_workers = decode_workers
+        self.write_workers = write_workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._errors = []
+        self.timings = {}
+
+    def _record(self, stage, started, items=1):
+        with self._lock:
+            timing = self.timings.setdefault(stage, {"busy": 0.0, "items": 0})
+            timing["busy"] += time.perf_counter() - started
+            timing["items"] += items
+
+    def _fail(self, stage, error):
+        logging.error(f"Detection pipeline {stage} stage failed: {error}")
+        with self._lock:
+            self._errors.append(error)
+
+    def _decode(self, paths, decoded):
+        """Decodes images until the paths run out."""
+        try:
+            while True:
+                image_path = paths.get()
+                if image_path is _STOP:
+                    break
+                started = time.perf_counter()
+                img = cv2.imread(image_path)
+                self._record("decode", started)
+                if img is None:
+                    logging.warning(f"Couldn't read image: {image_path}")
+                    continue
+                decoded.put((os.path.basename(image_path), img))
+        except Exception as e:
+            self._fail("decode", e)
+        finally:
+            decoded.put(_STOP)
+
+    def _infer(self, decoded, annotated):
+        """Runs the model on batches of decoded images."""
+        batch, running = [], self.decode_workers
+        try:
+            while running:
+                item = decoded.get()
+                if item is _STOP:
+                    running -= 1
+                else:
+                    batch.append(item)
+                if batch and (len(batch) == self.detector.batch_size or not running):
+                    started = time.perf_counter()
+                    results = self.detector.model([img for _, img in batch])
+                    self._record("inference", started, len(batch))
+                    for i, (name, img) in enumerate(batch):
+                        annotated.put((name, img, results.xyxy[i]))
+                    batch = []
+        except Exception as e:
+            self._fail("inference", e)
+            # Keep draining so the decoders don't block on a full queue
+            while running:
+                if decoded.get() is _STOP:
+                    running -= 1
+        finally:
+            for _ in range(self.write_workers):
+                annotated.put(_STOP)
+
+    def _annotate(self, annotated, detections, save_path):
+        """Draws the boxes, writes the images and passes their detections on."""
+        failed = False
+        while True:
+            item = annotated.get()
+            if item is _STOP:
+                break
+            if failed:
+                continue
+            try:
+                started = time.perf_counter()
+                name, img, predictions = item
+                image_detections = self.detector.annotate_image(
+                    img, name, predictions, save_path
+                )
+                self._record("annotate", started)
+                for detection in image_detections:
+                    detections.put(detection)
+            except Exception as e:
+                self._fail("annotate", e)
+                failed = True
+        detections.put(_STOP)
+
+    def _store(self, detections, db_handler, stats, replace_images=None):
+        """
+        Streams the detections to the database until every writer is done.
+
+        With `replace_images`, the model's earlier detections of these images
+        are replaced in one transaction instead. If any stage failed, the
+        detections are incomplete and the replacement is aborted before the
+        earlier detections are deleted.
+        """
+        running = self.write_workers
+
+        def drain(abort_on_failure=False):
+            nonlocal running
+            while running:
+                detection = detections.get()
+                if detection is _STOP:
+                    running -= 1
+                else:
+                    yield detection
+            # Every other stage is done once the last writer stopped
+            if abort_on_failure and self._errors:
+                raise RuntimeError(
+                    "An earlier pipeline stage failed, keeping the earlier "
+                    f"detections of {len(replace_images)} images."
+                )
+
+        started = time.perf_counter()
+        try:
+            if replace_images is None:
+                stats.update(db_handler.store_detections(drain()))
+            else:
+                stats.update(
+                    db_handler.replace_detections(
+                        replace_images,
+                        self.detector.model_name,
+                        drain(abort_on_failure=True),
+                    )
+                )
+        except Exception as e:
+            self._fail("store", e)
+            for _ in drain():
+                pass
+        # Includes waiting for detections, the handler pulls them lazily
+        self._record("store", started, stats.get("stored", 0))
+
+    def run(self, image_paths, db_handler, save_path=None, replace=False):
+        """
+        Detects objects in the images and stores the detections.
+
+        Args:
+            image_paths (list): Paths of the images to process.
+            db_handler (DatabaseHandler): Handler the detections are stored with.
+            save_path (str): Folder the annotated images are saved to, if given.
+            replace (bool): Replace the model's earlier detections of the images
+                instead of adding to them.
+
+        Returns:
+            dict: Number of stored and failed detections, and per stage the
+            seconds spent working and the number of items processed.
+        """
+        self._errors = []
+        self.timings = {}
+        paths = queue.Queue()
+        for image_path in image_paths:
+            paths.put(image_path)
+        for _ in range(self.decode_workers):
+            paths.put(_STOP)
+        decoded = queue.Queue(self.queue_size)
+        annotated = queue.Queue(self.queue_size)
+        detections = queue.Queue(self.queue_size * 10)
+        stats = {"stored": 0, "failed": 0}
+        replace_images = (
+            [os.path.basename(path) for path in image_paths] if replace else None
+        )
+
+        threads = [
+            threading.Thread(target=self._decode, args=(paths, decoded), daemon=True)
+            for _ in range(self.decode_workers)
+        ]
+        threads += [
+            threading.Thread(
+                target=self._annotate,
+                args=(annotated, detections, save_path),
+                daemon=True,
+            )
+            for _ in range(self.write_workers)
+        ]
+        threads.append(
+            threading.Thread(
+                target=self._store,
+                args=(detections, db_handler, stats, replace_images),
+                daemon=True,
+            )
+        )
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        self._infer(decoded, annotated)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        for stage, timing in self.timings.items():
+            logging.info(
+                f"Pipeline {stage}: {timing['busy']:.1f}s busy for {timing['items']} items."
+            )
+        logging.info(f"Detection pipeline finished in {elapsed:.1f}s.")
+        if self._errors:
+            raise self._errors[0]
+        return {**stats, "elapsed": elapsed, "stages": self.timings}
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+
+def file_hash(path, block_size=1 << 20):
+    """MD5 of the file's content, read in blocks."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImageRegistry:
+    """
+    Persistent record of the images every model has already processed.
+
+    An image is pending for a model when the model never processed its path or
+    the file changed since. Size and modification time are compared first; the
+    content hash is only computed when they differ, so unchanged images cost one
+    stat and an indexed lookup. A touched but identical file is recognised by
+    its hash and not processed again. The registry is kept in SQLite next to
+    the images' other state.
+    """
+
+    def __init__(self, db_path="../data/processed_images.db", chunk_size=500):
+        """
+        Args:
+            db_path (str): Path of the SQLite registry file.
+            chunk_size (int): Images detected and stored before they are marked
+                as processed; an interrupted run only redoes its last chunk.
+        """
+        self.chunk_size = chunk_size
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        # (path, model) -> (size, mtime_ns, content_hash) seen by pending()
+        self._files = {}
+
+    @classmethod
+    def for_folder(cls, image_folder, chunk_size=500):
+        """
+        Opens the registry kept next to the image folder, e.g.
+        ../data/processed_images.db for ../data/tg_image.
+        """
+        parent = os.path.dirname(os.path.normpath(image_folder))
+        return cls(os.path.join(parent, "processed_images.db"), chunk_size)
+
+    def create_tables(self):
+        """Creates the registry table if it doesn't exist."""
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed_images (
+                image_path TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                processed_at TEXT NOT NULL,
+                PRIMARY KEY (image_path, model_name)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def pending(self, image_paths, model_name):
+        """
+        Selects the images the model hasn't processed in their current state.
+
+        Args:
+            image_paths (list): Paths of the candidate images.
+            model_name (str): The detection model.
+
+        Returns:
+            list: The new or changed image paths, in input order.
+        """
+        known = {
+            path: (size, mtime_ns, content_hash)
+            for path, size, mtime_ns, content_hash in self.conn.execute(
+                """
+                SELECT image_path, size, mtime_ns, content_hash
+                FROM processed_images WHERE model_name = ?
+                """,
+                (model_name,),
+            )
+        }
+
+        pending, touched = [], []
+        for path in image_paths:
+            key = os.path.abspath(path)
+            stat = os.stat(path)
+            record = known.get(key)
+            if record is not None and record[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            content_hash = file_hash(path)
+            if record is not None and record[2] == content_hash:
+                touched.append((stat.st_size, stat.st_mtime_ns, key, model_name))
+                continue
+            self._files[(key, model_name)] = (
+                stat.st_size,
+                stat.st_mtime_ns,
+                content_hash,
+            )
+            pending.append(path)
+
+        if touched:
+            # Unchanged content, remember the new stat so it isn't hashed again
+            self.conn.executemany(
+                """
+                UPDATE processed_images SET size = ?, mtime_ns = ?
+                WHERE image_path = ? AND model_name = ?
+                """,
+                touched,
+            )
+            self.conn.commit()
+        logging.info(
+            f"{len(pending)} of {len(image_paths)} images are new or changed for {model_name}."
+        )
+        return pending
+
+    def mark_processed(self, image_paths, model_name):
+        """
+        Records the images as processed by the model.
+
+        The size, modification time and hash recorded are the ones seen by
+        pending(), so an image changing during the run is processed again.
+        """
+        processed_at = datetime.now().isoformat()
+        rows = []
+        for path in image_paths:
+            key = os.path.abspath(path)
+            size, mtime_ns, content_hash = self._files.pop((key, model_name), None) or (
+                os.path.getsize(path),
+                os.stat(path).st_mtime_ns,
+                file_hash(path),
+            )
+            rows.append((key, model_name, size, mtime_ns, content_hash, processed_at))
+        self.conn.executemany(
+            """
+            INSERT INTO processed_images
+                (image_path, model_name, size, mtime_ns, content_hash, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (image_path, model_name) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                content_hash = excluded.content_hash,
+                processed_at = excluded.processed_at
+            """,
+            rows,
+        )
+        self.conn.commit()
+
+    def process(self, image_paths, model_name, store):
+        """
+        Runs `store` on chunks of the pending images, marking every chunk stored
+        without failures as processed.
+
+        Args:
+            image_paths (list): Paths of the candidate images.
+            model_name (str): The detection model.
+            store (callable): Detects and stores a list of image paths,
+                returning the DatabaseHandler's stats. Pending images may have
+                been processed before, so it should replace their earlier
+                detections, e.g. with DatabaseHandler.replace_detections.
+
+        Returns:
+            dict: Summed stats of all chunks.
+        """
+        stats = {"stored": 0, "failed": 0}
+        image_paths = self.pending(image_paths, model_name)
+        for start in range(0, len(image_paths), self.chunk_size):
+            chunk = image_paths[start : start + self.chunk_size]
+            chunk_stats = store(chunk)
+            stats["stored"] += chunk_stats["stored"]
+            stats["failed"] += chunk_stats["failed"]
+            if chunk_stats["failed"] or chunk_stats.get("failed_images"):
+                # Leave the chunk pending, its dead-lettered detections are missing
+                logging.warning(
+                    f"Not marking {len(chunk)} images as processed, some of their "
+                    "detections failed to store."
+                )
+            else:
+                self.mark_processed(chunk, model_name)
+        return stats
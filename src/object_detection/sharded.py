@@ -0,0 +1,239 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# The worker's detector, loaded once by _init_worker
+_detector = None
+# Barrier shared by all workers and passed to _init_worker, see _worker_ready
+_ready = None
+
+
+def _init_worker(model_name, batch_size, threads, ready):
+    """Loads the model in a worker process and pins its torch thread counts."""
+    global _detector, _ready
+    _ready = ready
+    import torch
+
+    from object_detection.object_detections import YOLODetector
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel work of the process
+        pass
+    _detector = YOLODetector(model_name, batch_size=batch_size)
+
+
+def _worker_ready():
+    """
+    Waits until every worker runs this task, then returns the worker's pid.
+
+    A worker runs one task at a time and only after its initializer loaded the
+    model, so once all workers passed the barrier, every one of them is ready.
+    """
+    _ready.wait()
+    return os.getpid()
+
+
+def detect_shard(image_paths, save_path=None):
+    """
+    Detects objects in a shard of images in a worker process.
+
+    Returns:
+        tuple: (number of images, list of detection dicts)
+    """
+    detections = _detector.detect_objects_in_images(image_paths, save_path)
+    return len(image_paths), [
+        detection for image_detections in detections for detection in image_detections
+    ]
+
+
+class ShardedDetector:
+    """
+    Runs YOLO detection on CPU in several worker processes.
+
+    One process with torch's default threading scales poorly past a few cores,
+    several processes with a few intra-op threads each keep all cores busy.
+    Every worker loads the model once. The image list is cut into small shards
+    that are handed to whichever worker is free, so uneven images don't leave
+    workers idle. Detections stream back to the parent process, which is the
+    only one writing to the database.
+    """
+
+    def __init__(
+        self,
+        model_name="yolov5s",
+        workers=None,
+        threads_per_worker=1,
+        batch_size=8,
+        shard_size=32,
+    ):
+        """
+        Args:
+            model_name (str): The YOLOv5 model every worker loads.
+            workers (int): Number of worker processes (defaults to the CPU
+                count divided by threads_per_worker).
+            threads_per_worker (int): torch intra-op threads per worker.
+            batch_size (int): Images per inference call in a worker.
+            shard_size (int): Images per task handed to a worker.
+        """
+        self.model_name = model_name
+        self.threads_per_worker = threads_per_worker
+        self.workers = workers or max(1, os.cpu_count() // threads_per_worker)
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.load_seconds = 0.0
+        self._executor = None
+
+    def start(self):
+        """
+        Starts the worker processes and waits until every one loaded the model.
+
+        One task per worker is submitted, and the tasks wait on a barrier until
+        all of them run, so each worker holds exactly one of them. The time
+        taken is kept in `load_seconds`, apart from the detection time.
+        """
+        if self._executor is not None:
+            return
+        start = time.perf_counter()
+        context = multiprocessing.get_context()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(
+                self.model_name,
+                self.batch_size,
+                self.threads_per_worker,
+                context.Barrier(self.workers),
+            ),
+        )
+        futures = [self._executor.submit(_worker_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+        self.load_seconds = time.perf_counter() - start
+        logging.info(
+            f"Started {self.workers} workers with {self.model_name} in "
+            f"{self.load_seconds:.1f}s."
+        )
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def iter_detections(self, image_paths, save_path=None):
+        """
+        Yields detections as the workers finish their shards.
+
+        At most two shards per worker are queued at a time, so results don't
+        pile up when the consumer is slower than the workers. Workers started
+        by `start()` are kept running, otherwise they are started for this call
+        and stopped after it.
+        """
+        started_here = self._executor is None
+        self.start()
+        shards = [
+            image_paths[start : start + self.shard_size]
+            for start in range(0, len(image_paths), self.shard_size)
+        ]
+        self.images_done = 0
+        shards = iter(shards)
+        pending = set()
+        try:
+            while True:
+                for shard in shards:
+                    pending.add(self._executor.submit(detect_shard, shard, save_path))
+                    if len(pending) >= 2 * self.workers:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    images, detections = future.result()
+                    self.images_done += images
+                    yield from detections
+        finally:
+            # Don't leave shards of an abandoned run queued on the workers
+            for future in pending:
+                future.cancel()
+            if started_here:
+                self.close()
+
+    def process_image_folder(
+        self, image_folder, db_handler, save_path=None, registry=None
+    ):
+        """
+        Detects objects in every image of the folder and stores the detections.
+
+        With an ImageRegistry, only images this model hasn't processed yet, or
+        that changed since, are detected, one chunk at a time on the same
+        workers; their earlier detections by this model are replaced.
+
+        The workers are started and load the model before the clock starts, so
+        images per second measures detection only; the start-up time is
+        reported as `load_seconds`.
+
+        Returns:
+            dict: Number of stored and failed detections, images processed,
+            images per second and seconds spent starting the workers.
+        """
+        image_paths = sorted(
+            os.path.join(image_folder, image_file)
+            for image_file in os.listdir(image_folder)
+            if image_file.endswith((".jpg", ".png"))
+        )
+        started_here = self._executor is None
+        self.start()
+        start = time.perf_counter()
+        images = 0
+
+        def store(paths, replace=False):
+            nonlocal images
+            detections = self.iter_detections(paths, save_path)
+            if replace:
+                stats = db_handler.replace_detections(
+                    [os.path.basename(path) for path in paths],
+                    self.model_name,
+                    detections,
+                )
+            else:
+                stats = db_handler.store_detections(detections)
+            images += self.images_done
+            return stats
+
+        try:
+            if registry is not None:
+                stats = registry.process(
+                    image_paths,
+                    self.model_name,
+                    lambda paths: store(paths, replace=True),
+                )
+            else:
+                stats = store(image_paths)
+        finally:
+            if started_here:
+                self.close()
+        elapsed = time.perf_counter() - start
+        self.images_done = images
+        stats["images"] = self.images_done
+        stats["images_per_second"] = self.images_done / elapsed if elapsed else 0.0
+        stats["load_seconds"] = self.load_seconds
+        logging.info(
+            f"Processed {self.images_done} images with {self.workers} workers x "
+            f"{self.threads_per_worker} threads in {elapsed:.1f}s "
+            f"({stats['images_per_second']:.1f} images/s, workers started in "
+            f"{self.load_seconds:.1f}s)."
+        )
+        return stats
@@ -0,0 +1,14 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# The scraper scripts import each other as top-level modules, the cleaning and
+# detection code is imported as packages below src/
+for path in (
+    os.path.join(ROOT, "scripts", "telegram_scrape"),
+    os.path.join(ROOT, "src"),
+    ROOT,
+):
+    if path not in sys.path:
+        sys.path.insert(0, path)
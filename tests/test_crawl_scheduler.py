@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import Counter
+
+from crawl_scheduler import CrawlScheduler, CrawlStep, LeaseFile, RequestBudget
+
+
+def make_job(channel, fetched, steps=3):
+    """A channel job of `steps` steps that each charge one request to the budget."""
+
+    def job_factory(budget):
+        def fetch():
+            budget.try_spend()
+            time.sleep(0.02)
+            fetched[channel] += 1
+
+        def job():
+            for _ in range(steps):
+                yield CrawlStep(fetch, 1)
+
+        return job()
+
+    return job_factory
+
+
+def test_schedulers_sharing_a_lease_file_split_the_channels(tmp_path):
+    channels = [f"channel_{i}" for i in range(6)]
+    fetched = Counter()
+    schedulers = []
+    for owner in ("process_0", "process_1"):
+        scheduler = CrawlScheduler(
+            concurrency=2,
+            lease_file=LeaseFile(str(tmp_path / "leases.json"), owner=owner),
+            report_interval=60,
+            lease_retry_interval=0.05,
+        )
+        for channel in channels:
+            scheduler.add(channel, make_job(channel, fetched))
+        schedulers.append(scheduler)
+
+    threads = [threading.Thread(target=scheduler.run) for scheduler in schedulers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    crawled = [
+        {
+            channel
+            for channel, progress in scheduler.progress.items()
+            if progress.status == "done"
+        }
+        for scheduler in schedulers
+    ]
+    # Both schedulers did work and every channel was crawled exactly once
+    assert all(crawled)
+    assert not crawled[0] & crawled[1]
+    assert crawled[0] | crawled[1] == set(channels)
+    assert fetched == {channel: 3 for channel in channels}
+
+
+def test_channel_budget_counts_the_requests_actually_made():
+    fetched = Counter()
+
+    def job_factory(budget):
+        def fetch():
+            # A step estimated at one request that retries twice
+            for _ in range(3):
+                budget.try_spend()
+            fetched["channel"] += 1
+
+        def job():
+            while True:
+                yield CrawlStep(fetch, 1)
+
+        return job()
+
+    scheduler = CrawlScheduler(concurrency=1, report_interval=60)
+    scheduler.add("channel", job_factory, max_requests=10)
+    progress = scheduler.run()["channel"]
+
+    assert progress.status == "budget spent"
+    assert fetched["channel"] == 4
+    assert progress.requests == 10
+
+
+def test_request_budget_refuses_requests_beyond_the_limit(tmp_path):
+    budget = RequestBudget(2, str(tmp_path / "budget.json"))
+    budget.reset()
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    assert budget.remaining() == 0
@@ -0,0 +1,113 @@
+import random
+
+import pandas as pd
+import pytest
+
+from data_cleaning.data_cleaning import DataCleaning, load_raw_data, read_raw_chunks
+from data_cleaning.near_duplicates import NearDuplicateIndex
+from data_cleaning.parallel import clean_in_parallel
+from data_storage.data_storage import COPY_NULL, CLEANED_DATA_COLUMNS, DataStorage
+from post_sink import ParquetPostSink
+
+
+def scraped_posts(channels=("a", "b"), posts=50):
+    """Posts of several channels over several days, some without views."""
+    records = []
+    for channel in channels:
+        for number in range(posts):
+            records.append(
+                {
+                    "post_id": f"{channel}_{number}",
+                    "channel_name": f"Channel {channel}",
+                    "channel_username": channel,
+                    "message_text": f"Post {number} of {channel}",
+                    # Every fourth post lacks its view counter
+                    "views": None if number % 4 == 0 else str(number * 10),
+                    # Pairs of posts share a second, days change every 8 posts
+                    "timestamp": (
+                        f"2024-09-{1 + number // 8:02d}T{number % 8:02d}:00:"
+                        f"{number // 2 % 4:02d}+00:00"
+                    ),
+                    "image_urls": [],
+                    "image_paths": [],
+                    "source": "Telegram",
+                }
+            )
+    return records
+
+
+def write_parquet(root, records):
+    # Shuffled posts in small flushes, so files and rows are out of order
+    sink = ParquetPostSink(str(root), flush_rows=7, flush_interval=3600)
+    for record in records:
+        sink.write(record)
+    sink.close()
+
+
+def by_post_id(data):
+    return data.sort_values("post_id", ignore_index=True)
+
+
+def test_clean_chunks_matches_clean_data_on_parquet(tmp_path):
+    records = scraped_posts()
+    random.Random(0).shuffle(records)
+    write_parquet(tmp_path / "posts", records)
+    root = str(tmp_path / "posts")
+
+    expected = DataCleaning(load_raw_data(root)).clean_data()
+    streamed = pd.concat(
+        DataCleaning().clean_chunks(read_raw_chunks(root, chunksize=9)),
+        ignore_index=True,
+    )
+
+    assert len(streamed) == len(expected) == 100
+    expected, streamed = by_post_id(expected), by_post_id(streamed)
+    assert streamed["views"].tolist() == expected["views"].tolist()
+    assert streamed["timestamp"].tolist() == expected["timestamp"].tolist()
+
+
+def test_clean_chunks_rejects_posts_going_back_in_time(tmp_path):
+    records = scraped_posts(channels=("a",), posts=30)
+    frame = pd.DataFrame(records).astype({"views": str})
+    path = tmp_path / "posts.csv"
+    # The oldest posts are appended after the newer ones, e.g. by a gap retry
+    pd.concat([frame.iloc[10:], frame.iloc[:10]]).to_csv(path, index=False)
+
+    with pytest.raises(ValueError, match="publication order"):
+        for _ in DataCleaning().clean_chunks(read_raw_chunks(str(path), chunksize=10)):
+            pass
+
+
+def test_clean_in_parallel_marks_near_duplicates_across_channels(tmp_path):
+    records = scraped_posts(posts=8)
+    # A repost of a's first post in channel b, published a day later
+    records.append(
+        {
+            **records[0],
+            "post_id": "b_repost",
+            "channel_name": "Channel b",
+            "channel_username": "b",
+            "message_text": "  POST 0 of a ",
+            "timestamp": "2024-09-02T00:00:00+00:00",
+        }
+    )
+    raw_data = pd.DataFrame(records)
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.db"))
+
+    cleaned = clean_in_parallel(
+        raw_data, workers=2, near_duplicates=index, duplicate_mode="mark"
+    )
+
+    duplicate_of = cleaned.set_index("post_id")["duplicate_of"]
+    assert duplicate_of["b_repost"] == "a_0"
+    assert duplicate_of.drop("b_repost").isna().all()
+    assert list(cleaned["channel_username"]) == sorted(cleaned["channel_username"])
+
+    # The marks reach the COPY input of cleaned_data
+    rows = pd.read_csv(
+        DataStorage(None)._copy_buffer(cleaned),
+        names=CLEANED_DATA_COLUMNS,
+        keep_default_na=False,
+    ).set_index("post_id")
+    assert rows.loc["b_repost", "duplicate_of"] == "a_0"
+    assert rows.loc["a_0", "duplicate_of"] == COPY_NULL
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from object_detection.pipeline import DetectionPipeline  # noqa: E402
+
+
+class Results:
+    def __init__(self, count):
+        self.xyxy = [[] for _ in range(count)]
+
+
+class FailingDetector:
+    """Finds one object per image, but can't annotate `broken_image`."""
+
+    model_name = "yolov5s"
+    batch_size = 2
+
+    def __init__(self, broken_image):
+        self.broken_image = broken_image
+
+    def model(self, images):
+        return Results(len(images))
+
+    def annotate_image(self, img, image_name, predictions, save_path=None):
+        if image_name == self.broken_image:
+            raise OSError(f"Couldn't write {image_name}")
+        return [{"image_name": image_name, "class_name": "bottle"}]
+
+
+class InMemoryHandler:
+    """Keeps detections per image and replaces them like DatabaseHandler."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def replace_detections(self, image_names, model_name, detections):
+        detections = list(detections)
+        for name in image_names:
+            self.rows.pop(name, None)
+        for detection in detections:
+            self.rows.setdefault(detection["image_name"], []).append(detection)
+        return {"stored": len(detections), "failed": 0, "failed_images": 0}
+
+
+def test_failed_stage_keeps_earlier_detections_in_replace_mode(tmp_path):
+    image_paths = []
+    for number in range(6):
+        path = str(tmp_path / f"image_{number}.jpg")
+        cv2.imwrite(path, np.zeros((8, 8, 3), dtype=np.uint8))
+        image_paths.append(path)
+    earlier = {
+        os.path.basename(path): [{"image_name": os.path.basename(path)}]
+        for path in image_paths
+    }
+    handler = InMemoryHandler({name: list(rows) for name, rows in earlier.items()})
+
+    pipeline = DetectionPipeline(
+        FailingDetector("image_3.jpg"), decode_workers=2, write_workers=2
+    )
+    with pytest.raises(OSError):
+        pipeline.run(image_paths, handler, replace=True)
+
+    assert handler.rows == earlier
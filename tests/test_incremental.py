@@ -0,0 +1,46 @@
+import pandas as pd
+
+from data_cleaning.incremental import IncrementalCleaning
+
+
+def post(number, views, text=None):
+    return {
+        "post_id": f"a_{number}",
+        "channel_name": "Channel a",
+        "channel_username": "a",
+        "message_text": text or f"Post {number}",
+        "views": views,
+        "timestamp": f"2024-09-01T{number:02d}:00:00+00:00",
+        "image_urls": None,
+        "image_paths": None,
+        "source": "Telegram",
+    }
+
+
+def append(path, posts, header=False):
+    pd.DataFrame(posts).to_csv(path, mode="a", header=header, index=False)
+
+
+def test_rescraped_post_replaces_its_lookback_version(tmp_path):
+    source = tmp_path / "telegram_data.csv"
+    state_dir = str(tmp_path / "state")
+    append(source, [post(number, str(100 + number)) for number in range(10)], True)
+
+    cleaning = IncrementalCleaning(str(source), state_dir, views_window=2)
+    first, _ = cleaning.run()
+    cleaning.commit()
+    assert len(first) == 10
+
+    # Post 9 is still in the lookback when it is scraped again
+    append(source, [post(9, "2.5K", "Post 9, edited"), post(10, "110")])
+    cleaning = IncrementalCleaning(str(source), state_dir, views_window=2)
+    second, _ = cleaning.run()
+    cleaning.commit()
+
+    second = second.set_index("post_id")
+    assert sorted(second.index) == ["a_10", "a_9"]
+    assert second.loc["a_9", "views"] == 2500
+    assert second.loc["a_9", "message_text"] == "Post 9, edited"
+    # The lookback keeps the new version too
+    lookback = cleaning.lookback.set_index("post_id")
+    assert lookback.loc["a_9", "views"] == 2500
@@ -0,0 +1,52 @@
+import glob
+import os
+
+import pytest
+
+from post_extractors import EXTRACTORS, get_extractor
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "telegram_pages")
+PAGES = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+
+
+def read_page(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_fixture_pages_exist():
+    assert PAGES
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+@pytest.mark.parametrize("name", [name for name in EXTRACTORS if name != "html.parser"])
+def test_extractor_matches_beautifulsoup(path, name):
+    html = read_page(path)
+    assert get_extractor(name).parse_page(html) == get_extractor(
+        "html.parser"
+    ).parse_page(html)
+
+
+def test_extracted_fields():
+    html = read_page(os.path.join(FIXTURES, "pharmacy_channel_page1.html"))
+    channel_name, posts = get_extractor("lxml").parse_page(html)
+
+    assert channel_name == "Example Pharmacy💊Channel"
+    assert [post["data_post"] for post in posts] == [
+        "example_pharmacy/101",
+        "example_pharmacy/102",
+        "example_pharmacy/103",
+        "example_pharmacy/106",
+    ]
+    # Emoji images are dropped from the text, entities are decoded
+    assert posts[0]["message_text"] == (
+        "New stock arrivedVitamin C 1000mg & Zinc tabletsCall+251 911 000 000or visitBole Road."
+    )
+    assert posts[0]["views"] == "1.2K"
+    assert posts[2]["author"] == "Selam T."
+    # Album photos without a background image are skipped
+    assert posts[2]["image_urls"] == [
+        "https://cdn4.cdn-telegram.org/file/photo_103_a.jpg",
+        "https://cdn4.cdn-telegram.org/file/photo_103_b.jpg",
+    ]
+    assert "message_text" not in posts[3]